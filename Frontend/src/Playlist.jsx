@@ -3,6 +3,8 @@ import { useLocation, useNavigate } from "react-router-dom";
 import { motion } from "framer-motion";
 import ReactPlayer from "react-player";
 import Quiz from './Quiz'; // Import the Quiz component
+import LottieLoader from "./LottieLoader";
+import { streamLesson } from "./lessonStream";
 
 // Utility function to replace the imported cn function
 function cn(...classes) {
@@ -12,22 +14,39 @@ function cn(...classes) {
 function Playlist() {
   const location = useLocation();
   const navigate = useNavigate();
-  const videos = location.state?.videos || [];
+  const lessonData = location.state?.lessonData;
+  const [videos, setVideos] = useState(location.state?.videos || []);
+  const [streaming, setStreaming] = useState(Boolean(lessonData));
 
   const [openSection, setOpenSection] = useState(false);
-  const [currentIndex, setCurrentIndex] = useState(0);
+  // Track the playing video by URL: streamed videos can land before it in the list
+  const [currentUrl, setCurrentUrl] = useState(null);
   const [showQuiz, setShowQuiz] = useState(false); // State to control Quiz visibility
+  const currentIndex = Math.max(videos.findIndex((video) => video.url === currentUrl), 0);
+  const setCurrentIndex = (index) => setCurrentUrl(videos[index]?.url);
+
+  // Stream the lesson in when we arrive from the welcome page
+  useEffect(() => {
+    if (!lessonData) return;
+    const controller = new AbortController();
+    streamLesson(lessonData, setVideos, controller.signal)
+      .catch((error) => {
+        if (error.name !== "AbortError") console.error("Error fetching videos:", error);
+      })
+      .finally(() => setStreaming(false));
+    return () => controller.abort();
+  }, [lessonData]);
 
   // Set first video when videos are received
   useEffect(() => {
-    if (videos.length > 0) {
-      setCurrentIndex(0);
+    if (videos.length > 0 && currentUrl === null) {
+      setCurrentUrl(videos[0].url);
     }
-  }, [videos]);
+  }, [videos, currentUrl]);
 
   // Function to go to the next video
   const handleNextVideo = () => {
-    setCurrentIndex((prevIndex) => (prevIndex + 1) % videos.length);
+    setCurrentIndex((currentIndex + 1) % videos.length);
   };
 
   // Function to send video URL to the backend and show the Quiz
@@ -43,6 +62,9 @@ function Playlist() {
 
   return (
     <div className="relative min-h-screen w-full overflow-hidden bg-[#030303] text-white">
+      {/* Loading Spinner Overlay until the first videos arrive */}
+      {streaming && videos.length === 0 && <LottieLoader />}
+
       {/* Background gradient */}
       <div className="absolute inset-0 bg-gradient-to-br from-[#E50914]/[0.05] via-transparent to-indigo-500/[0.05] blur-3xl" />
 
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { useParams } from "react-router-dom"; // Import useParams
+import { readNdjson } from "./ndjson";
 
 const MCQQuiz = () => {
   const { youtubeId } = useParams(); // Extract youtubeId from the URL
@@ -10,34 +11,46 @@ const MCQQuiz = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  // Fetch quiz data from the Flask backend
+  // Stream quiz questions from the Flask backend; the first one shows as soon as it is written
   useEffect(() => {
+    const controller = new AbortController();
+
     const fetchQuizData = async () => {
       try {
-        const response = await fetch("http://localhost:5000/quiz", {
+        const response = await fetch("http://localhost:5000/quiz/stream", {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
           },
           body: JSON.stringify({ youtubeId }), // Send youtubeId to the backend
-
+          signal: controller.signal,
         });
 
         if (!response.ok) {
           throw new Error("Failed to fetch quiz data");
         }
 
-        const data = await response.json();
-        setQuestions(data);
+        await readNdjson(response, (event) => {
+          if (event.type === "question") {
+            setQuestions((prev) => [...prev, event.question]);
+            setLoading(false);
+          } else if (event.type === "error") {
+            throw new Error(event.error);
+          }
+        });
         setLoading(false);
       } catch (error) {
+        if (error.name === "AbortError") return;
         console.error("Error fetching quiz data:", error);
         setError(error.message);
         setLoading(false);
       }
     };
 
+    setQuestions([]);
+    setLoading(true);
     fetchQuizData();
+    return () => controller.abort();
   }, [youtubeId]);
 
   // Handle answer selection
@@ -1,7 +1,6 @@
 import React, { useState } from "react";
 import { motion } from "framer-motion";
 import { useNavigate } from "react-router-dom"; // Import useNavigate
-import LottieLoader from "./LottieLoader";
 
 // Utility function to replace the imported cn function
 function cn(...classes) {
@@ -74,7 +73,6 @@ function Welcomepage() {
   const [duration, setDuration] = useState("");
   const [sliderValue, setSliderValue] = useState(5);
   const [randomTheme, setRandomTheme] = useState("");
-  const [loading, setLoading] = useState(false);
   const [lessonVideos, setLessonVideos] = useState([]);
 
   // Input handlers
@@ -97,27 +95,8 @@ function Welcomepage() {
       randomTheme,
     };
 
-    setLoading(true);
-
-    try {
-      const response = await fetch("http://127.0.0.1:5000/process", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(lessonData),
-      });
-
-      if (!response.ok) throw new Error("Failed to fetch videos");
-      
-      const data = await response.json();
-      console.log("Fetched videos:", data);
-
-      //setLessonVideos(data);
-      navigate("/playlist", { state: { videos: data } });
-    } catch (error) {
-      console.error("Error fetching videos:", error);
-    } finally {
-      setLoading(false);
-    }
+    // The playlist page streams the lesson in, so videos show up as soon as they are found
+    navigate("/playlist", { state: { lessonData } });
   };
 
   const fadeUpVariants = {
@@ -177,9 +156,6 @@ function Welcomepage() {
         />
       </div>
 
-      {/* Loading Spinner Overlay */}
-      {loading && <LottieLoader />}
-
       <div className="relative z-10 container mx-auto px-4 pt-16 pb-8 flex flex-col min-h-screen">
         {/* Header */}
         <div className="text-center mb-16">
@@ -0,0 +1,27 @@
+import { readNdjson } from "./ndjson";
+
+// Reads the NDJSON stream from /process/stream and reports the playlist as it grows.
+// Each "videos" event fills one lesson slot; the playlist is the slots in order.
+export async function streamLesson(lessonData, onVideos, signal) {
+  const response = await fetch("http://127.0.0.1:5000/process/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(lessonData),
+    signal,
+  });
+
+  if (!response.ok) throw new Error("Failed to fetch videos");
+
+  const slots = [];
+
+  const handleEvent = (event) => {
+    if (event.type === "videos") {
+      slots[event.index] = [...(slots[event.index] || []), ...event.videos];
+      onVideos(slots.flat()); // flat() skips slots that haven't arrived yet
+    } else if (event.type === "error") {
+      throw new Error(event.error);
+    }
+  };
+
+  await readNdjson(response, handleEvent);
+}
@@ -0,0 +1,297 @@
+"""
+Offline benchmark for the /process and /quiz pipelines.
+
+OpenAI, YouTube search and subtitle downloads are replaced by the stand-ins in fakes.py
+(fixtures plus artificial latency), so runs are repeatable and cost nothing.
+Everything in between (task graph, caches, dedup, LLM gateway, parsing) is the real code.
+
+    python benchmarks/bench.py --concurrency 1,4,16 --requests 32 --output run.json
+    python benchmarks/compare.py baseline.json run.json
+
+Each request uses a distinct topic / video ID so caches and coalescing don't hide the
+pipeline cost; pass --repeat-inputs to measure the warm-cache path instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--endpoint", choices=["process", "quiz", "all"], default="all")
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi", help="Flask routes (threads) or the native ASGI handlers (event loop)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before each level")
+    parser.add_argument("--repeat-inputs", action="store_true", help="Reuse one topic / video so caches and coalescing kick in")
+    parser.add_argument("--llm-first", type=float, default=0.5, help="Seconds before the first LLM chunk")
+    parser.add_argument("--llm-chunk", type=float, default=0.005, help="Seconds between LLM chunks")
+    parser.add_argument("--search-latency", type=float, default=0.8, help="Seconds per search")
+    parser.add_argument("--subtitle-latency", type=float, default=0.4, help="Seconds per subtitle download")
+    parser.add_argument("--search-fixtures", help="Search fixture JSON (default: fixtures/search.json, synthetic)")
+    parser.add_argument("--vtt", action="append", default=[], help="Recorded VTT file (repeatable; default: subs.txt.en.vtt)")
+    parser.add_argument("--llm-limits", action="store_true", help="Keep the production LLM rate limiter and in-flight cap (off by default so results measure the pipeline)")
+    parser.add_argument("--trace-memory", action="store_true", help="Report tracemalloc peaks (slows the run)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--record", metavar="QUERY", nargs="+", help="Record live yt_dlp searches into the search fixtures and exit")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    # Must run before flaskr is imported: config is read at import time
+    os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="bench-cache-"))
+    os.environ.setdefault("SEARCH_BACKEND", "fixture")
+    os.environ.setdefault("QUIZ_PREFETCH_COUNT", "0")  # Background quizzes would compete with measured requests
+    os.environ.setdefault("YDL_WARM", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.llm_limits:
+        # The fake OpenAI has no quota to protect; with the limiter on, every level would just measure its rate
+        os.environ.setdefault("LLM_REQUESTS_PER_SECOND", "0")
+        os.environ.setdefault("LLM_MAX_IN_FLIGHT", "10000")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall, errors):
+    latencies = sorted(latencies)
+    to_ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+        "latency_ms": {
+            "mean": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": to_ms(percentile(latencies, 0.50)),
+            "p95": to_ms(percentile(latencies, 0.95)),
+            "p99": to_ms(percentile(latencies, 0.99)),
+            "max": to_ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def request_body(endpoint, index, args):
+    suffix = "" if args.repeat_inputs else f" {index}"
+    if endpoint == "process":
+        return "/process", {"studyTopic": f"photosynthesis{suffix}", "duration": "medium", "randomTheme": f"funny cats{suffix}"}
+    video = "benchVideo0" if args.repeat_inputs else f"bench{index:06d}"
+    return "/quiz", {"youtubeId": video}
+
+
+def ok(endpoint, status, payload):
+    if status != 200:
+        return False
+    if endpoint == "quiz":
+        return isinstance(payload, list) and len(payload) > 0
+    return isinstance(payload, list)
+
+
+class WsgiRunner:
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def _client(self):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        return self.local.client
+
+    def call(self, path, body):
+        response = self._client().post(path, json=body)
+        return response.status_code, response.get_json()
+
+    def run(self, endpoint, indices, concurrency, args):
+        latencies, errors = [], 0
+        lock = threading.Lock()
+
+        def one(index):
+            nonlocal errors
+            path, body = request_body(endpoint, index, args)
+            start = time.perf_counter()
+            status, payload = self.call(path, body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok(endpoint, status, payload):
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, indices))
+        return latencies, errors, time.perf_counter() - start
+
+
+class AsgiRunner:
+    def __init__(self, app):
+        self.app = app
+
+    async def call(self, path, body):
+        messages = [{"type": "http.request", "body": json.dumps(body).encode("utf-8")}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": path, "headers": [(b"content-type", b"application/json")]}
+        await self.app(scope, receive, send)
+        status = sent[0]["status"]
+        payload = json.loads(b"".join(message.get("body", b"") for message in sent[1:]) or b"null")
+        return status, payload
+
+    def run(self, endpoint, indices, concurrency, args):
+        async def main():
+            latencies, errors = [], 0
+            gate = asyncio.Semaphore(concurrency)
+
+            async def one(index):
+                nonlocal errors
+                async with gate:
+                    path, body = request_body(endpoint, index, args)
+                    start = time.perf_counter()
+                    status, payload = await self.call(path, body)
+                    elapsed = time.perf_counter() - start
+                if ok(endpoint, status, payload):
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(index) for index in indices))
+            return latencies, errors, time.perf_counter() - start
+
+        return asyncio.run(main())
+
+
+def max_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(queries, path, count=30):
+    """
+    Runs real yt_dlp searches and stores their flat entries as fixtures (needs network access).
+    """
+    from flaskr.backends import YtDlpBackend
+    from fakes import FIXTURES, load_search_fixtures
+
+    path = path or os.path.join(FIXTURES, "search.json")
+    fixtures = load_search_fixtures(path) if os.path.exists(path) else {}
+    keep = ("_type", "ie_key", "id", "url", "title", "channel", "duration", "view_count")
+    for query in queries:
+        entries = YtDlpBackend().search(query, count)
+        fixtures[query] = [{key: entry.get(key) for key in keep} for entry in entries]
+        print(f"Recorded {len(entries)} results for {query!r}", file=sys.stderr)
+    with open(path, "w") as file:
+        json.dump(fixtures, file, indent=1)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+
+    from flaskr import backends, config, create_app, routes
+    from fakes import FixtureBackend, Latency, fake_download_subtitles, fake_openai, load_search_fixtures, load_vtt_fixtures
+
+    if args.record:
+        return record(args.record, args.search_fixtures)
+
+    latency = Latency(llm_first=args.llm_first, llm_chunk=args.llm_chunk, search=args.search_latency, subtitles=args.subtitle_latency)
+    llm_stats = {"calls": 0}
+    routes.llm.client, routes.llm.async_client = fake_openai(latency, llm_stats)
+    fixtures = load_search_fixtures(args.search_fixtures)
+    backends.BACKENDS["fixture"] = lambda: FixtureBackend(fixtures, latency)
+    routes.download_subtitles = fake_download_subtitles(load_vtt_fixtures(args.vtt), latency)
+
+    app = create_app()
+    if args.server == "asgi":
+        from flaskr.asgi import AsyncApp
+        runner = AsgiRunner(AsyncApp(app))
+    else:
+        runner = WsgiRunner(app)
+
+    endpoints = ["process", "quiz"] if args.endpoint == "all" else [args.endpoint]
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    results = []
+    next_index = 0
+    for endpoint in endpoints:
+        for concurrency in levels:
+            warmup = list(range(next_index, next_index + args.warmup))
+            measured = list(range(next_index + args.warmup, next_index + args.warmup + args.requests))
+            next_index = measured[-1] + 1 if measured else next_index + args.warmup
+            if warmup:
+                runner.run(endpoint, warmup, min(concurrency, len(warmup)), args)
+
+            calls_before = llm_stats["calls"]
+            if args.trace_memory:
+                tracemalloc.start()
+            latencies, errors, wall = runner.run(endpoint, measured, concurrency, args)
+            result = {"endpoint": endpoint, "concurrency": concurrency, **summarize(latencies, wall, errors)}
+            result["llm_calls"] = llm_stats["calls"] - calls_before
+            result["memory"] = {"max_rss_mb": max_rss_mb()}
+            if args.trace_memory:
+                result["memory"]["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+                tracemalloc.stop()
+            results.append(result)
+            print(
+                f"{endpoint:<8} c={concurrency:<3} {result['throughput_rps']} req/s  "
+                f"p50 {result['latency_ms']['p50']} ms  p95 {result['latency_ms']['p95']} ms  "
+                f"p99 {result['latency_ms']['p99']} ms  errors {errors}",
+                file=sys.stderr,
+            )
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "server": args.server,
+            "repeat_inputs": args.repeat_inputs,
+            "llm_limits": args.llm_limits,
+            "latency": vars(latency),
+            "config": {
+                name: getattr(config, name)
+                for name in ("SEARCH_POOL_SIZE", "STAGE_POOL_SIZE", "LLM_MAX_IN_FLIGHT", "LLM_REQUESTS_PER_SECOND", "LLM_BURST", "PIPELINE_DEADLINE")
+            },
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares two bench.py reports level by level.
+
+    python benchmarks/compare.py baseline.json candidate.json
+
+Prints throughput and latency percentiles side by side with the relative change;
+--json prints the same comparison as JSON.
+"""
+import argparse
+import json
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare(baseline, candidate):
+    before = {(result["endpoint"], result["concurrency"]): result for result in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        old = before.get((result["endpoint"], result["concurrency"]))
+        if old is None:
+            continue
+        row = {"endpoint": result["endpoint"], "concurrency": result["concurrency"]}
+        row["throughput_rps"] = {"before": old["throughput_rps"], "after": result["throughput_rps"], "change_pct": change(old["throughput_rps"], result["throughput_rps"])}
+        for name in ("p50", "p95", "p99"):
+            a, b = old["latency_ms"][name], result["latency_ms"][name]
+            row[name] = {"before": a, "after": b, "change_pct": change(a, b)}
+        row["errors"] = {"before": old["errors"], "after": result["errors"]}
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two bench.py reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.candidate) as file:
+        candidate = json.load(file)
+    rows = compare(baseline, candidate)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{baseline['meta'].get('revision')} -> {candidate['meta'].get('revision')}")
+    for row in rows:
+        cells = [f"{row['endpoint']:<8} c={row['concurrency']:<3}"]
+        for name in ("throughput_rps", "p50", "p95", "p99"):
+            cell = row[name]
+            pct = "n/a" if cell["change_pct"] is None else f"{cell['change_pct']:+.1f}%"
+            cells.append(f"{name} {cell['before']} -> {cell['after']} ({pct})")
+        print("  ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Local stand-ins for everything the pipelines call out to, so benchmarks run offline:
+a fake OpenAI client (sync and async, streaming or not), a search backend that replays
+flat-search fixture entries, and a subtitle downloader that serves VTT files.
+The bundled fixtures/search.json is synthetic (placeholder IDs and channels); bench.py --record
+adds live searches.
+Each stand-in sleeps for a configurable latency to imitate the real service.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+
+from flaskr.backends import SearchBackend
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ID_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+class Latency:
+    """
+    Artificial latencies in seconds. LLM answers arrive as `chunk_size`-character chunks:
+    `llm_first` before the first one, `llm_chunk` between the rest.
+    """
+
+    def __init__(self, llm_first=0.5, llm_chunk=0.005, chunk_size=24, search=0.8, subtitles=0.4):
+        self.llm_first = llm_first
+        self.llm_chunk = llm_chunk
+        self.chunk_size = chunk_size
+        self.search = search
+        self.subtitles = subtitles
+
+
+def _fake_id(seed):
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    return "".join(_ID_ALPHABET[byte % 64] for byte in digest[:11])
+
+
+# **Fake OpenAI**
+def lesson_plan_arguments(content, steps=6):
+    match = re.search(r"for this topic: \*\*(.*?)\*\*", content)
+    topic = match.group(1) if match else content.strip()[:60]
+    aspects = ["introduction", "history", "core concepts", "worked examples", "common mistakes", "applications", "advanced topics", "review"]
+    return json.dumps({"steps": [
+        {"step": index + 1, "query": f"{topic} {aspect}", "concept": aspect}
+        for index, aspect in enumerate(aspects[:steps])
+    ]})
+
+
+def quiz_arguments(count):
+    return json.dumps({"questions": [
+        {
+            "question": f"Which statement about point {index + 1} of the video is correct?",
+            "options": [f"A. Statement {index}a", f"B. Statement {index}b", f"C. Statement {index}c", f"D. Statement {index}d"],
+            "answer": "ABCD"[index % 4],
+        }
+        for index in range(count)
+    ]})
+
+
+def _arguments(tools, messages):
+    name = tools[0]["function"]["name"] if tools else None
+    content = messages[-1]["content"]
+    if name == "submit_lesson_plan":
+        return lesson_plan_arguments(content)
+    count = 8
+    if content.startswith("Write "):
+        count = int(content.split()[1])
+    return quiz_arguments(count)
+
+
+def _message(text):
+    call = SimpleNamespace(function=SimpleNamespace(name="tool", arguments=text))
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))])
+
+
+def _chunk(text):
+    call = SimpleNamespace(function=SimpleNamespace(arguments=text))
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[call]))])
+
+
+class _Completions:
+    def __init__(self, latency, stats):
+        self.latency = latency
+        self.stats = stats
+
+    def _pieces(self, text):
+        size = self.latency.chunk_size
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeCompletions(_Completions):
+    def create(self, model=None, messages=(), tools=None, stream=False, **kwargs):
+        self.stats["calls"] += 1
+        text = _arguments(tools, messages)
+        time.sleep(self.latency.llm_first)
+        if not stream:
+            time.sleep(self.latency.llm_chunk * len(self._pieces(text)))
+            return _message(text)
+
+        def chunks():
+            for index, piece in enumerate(self._pieces(text)):
+                if index:
+                    time.sleep(self.latency.llm_chunk)
+                yield _chunk(piece)
+        return chunks()
+
+
+class AsyncFakeCompletions(_Completions):
+    async def create(self, model=None, messages=(), tools=None, stream=False, **kwargs):
+        self.stats["calls"] += 1
+        text = _arguments(tools, messages)
+        await asyncio.sleep(self.latency.llm_first)
+        if not stream:
+            await asyncio.sleep(self.latency.llm_chunk * len(self._pieces(text)))
+            return _message(text)
+
+        async def chunks():
+            for index, piece in enumerate(self._pieces(text)):
+                if index:
+                    await asyncio.sleep(self.latency.llm_chunk)
+                yield _chunk(piece)
+        return chunks()
+
+
+def fake_openai(latency, stats):
+    """
+    Returns (client, async_client) shaped like OpenAI / AsyncOpenAI for chat.completions.create.
+    """
+    return (
+        SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(latency, stats))),
+        SimpleNamespace(chat=SimpleNamespace(completions=AsyncFakeCompletions(latency, stats))),
+    )
+
+
+# **Search fixtures**
+def load_search_fixtures(path=None):
+    with open(path or os.path.join(FIXTURES, "search.json")) as file:
+        return json.load(file)
+
+
+class FixtureBackend(SearchBackend):
+    """
+    Replays flat-search fixture entries. A query with no fixture gets one of the fixture
+    result sets (picked by hash) with IDs rewritten per query, except every fifth
+    entry, which keeps its ID so different keywords still turn up some of the same videos.
+    """
+
+    name = "fixture"
+
+    def __init__(self, fixtures, latency):
+        self.fixtures = fixtures
+        self.result_sets = [fixtures[query] for query in sorted(fixtures)]
+        self.latency = latency
+
+    def search(self, query, count):
+        time.sleep(self.latency.search)
+        if query in self.fixtures:
+            return self.fixtures[query][:count]
+        base = self.result_sets[int(hashlib.sha1(query.encode("utf-8")).hexdigest(), 16) % len(self.result_sets)]
+        entries = []
+        for index, entry in enumerate(base[:count]):
+            if index % 5:
+                new_id = _fake_id(f"{query}/{entry['id']}")
+                entry = {**entry, "id": new_id, "url": f"https://www.youtube.com/watch?v={new_id}", "title": f"{query} ({index})"}
+            entries.append(entry)
+        return entries
+
+
+# **Subtitle fixtures**
+def load_vtt_fixtures(paths=()):
+    paths = list(paths) or [os.path.join(ROOT, "subs.txt.en.vtt")]
+    texts = []
+    for path in paths:
+        with open(path) as file:
+            texts.append(file.read())
+    return texts
+
+
+def fake_download_subtitles(texts, latency):
+    """
+    Stand-in for routes.download_subtitles: the same video always gets the same VTT file.
+    """
+    def download_subtitles(youtube_id, lang="en"):
+        time.sleep(latency.subtitles)
+        return texts[int(hashlib.sha1(youtube_id.encode("utf-8")).hexdigest(), 16) % len(texts)]
+    return download_subtitles
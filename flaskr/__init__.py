@@ -1,6 +1,9 @@
 from flask import Flask
 from flask_cors import CORS
 
+from . import config, httpclient, metrics
+from .ydl import pool as ydl_pool
+
 # @app.route("/quiz", methods=["POST"])
 # def process_quiz():
 #     data = request.json
@@ -25,7 +28,7 @@ def get_subtitles(youtube_id):
         "writesubtitles": True,
         "subtitleslangs": ['en'],
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    with ydl_pool.checkout(ydl_opts) as ydl:
         info = ydl.extract_info(url, download=False)
         subtitles = info.get('subtitles', {})
         en_subtitles = subtitles.get('en', [])
@@ -33,9 +36,8 @@ def get_subtitles(youtube_id):
             # Fetch the URL of the English subtitles
             subtitle_url = en_subtitles[0].get('url')
             if subtitle_url:
-                # Download the subtitle content
-                import requests
-                response = requests.get(subtitle_url)
+                # Download the subtitle content over the shared keep-alive client
+                response = httpclient.get_client().get(subtitle_url)
                 if response.status_code == 200:
                     return response.text
                 else:
@@ -64,11 +66,14 @@ def create_quiz(subtitles):
 
 
 def create_app():
+    metrics.configure_logging(config.LOG_LEVEL)  # Every log line carries its request's trace ID
     app = Flask(__name__)
-    CORS(app, origins=["http://localhost:4173"])  # Allow requests from your frontend
+    CORS(app, origins=config.CORS_ORIGINS)  # Allow requests from your frontend
 
     # Register routes
-    from .routes import bp
+    from .routes import bp, start_quiz_workers, warm_ydl_pool
     app.register_blueprint(bp)
+    warm_ydl_pool()
+    start_quiz_workers()
 
     return app
\ No newline at end of file
@@ -0,0 +1,43 @@
+import math
+import threading
+
+from . import config
+
+
+class PassRateTracker:
+    """
+    Running estimate (exponentially weighted) of what fraction of raw search results
+    survive each duration filter. Used to decide how many results to fetch up front so a
+    keyword yields its target count in one search most of the time.
+    """
+
+    def __init__(self, prior=0.5, weight=0.2, floor=0.05):
+        self.prior = prior
+        self.weight = weight  # How much one search moves the estimate
+        self.floor = floor  # Never assume less than this, or fetch sizes explode
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    def rate(self, key):
+        with self._lock:
+            return max(self._rates.get(key, self.prior), self.floor)
+
+    def record(self, key, passed, total):
+        if total <= 0:
+            return
+        with self._lock:
+            current = self._rates.get(key, self.prior)
+            self._rates[key] = current + self.weight * (passed / total - current)
+
+    def fetch_count(self, key, target, have=0, fetched=0):
+        """
+        How many raw results to request so that about `target` pass the filter, given that
+        `have` of the `fetched` raw results seen so far passed. Clamped to [target, SEARCH_MAX_FETCH].
+        """
+        needed = max(target - have, 0)
+        count = fetched + math.ceil(needed / self.rate(key) * config.SEARCH_OVERFETCH_MARGIN)
+        return max(target, min(count, config.SEARCH_MAX_FETCH))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._rates)
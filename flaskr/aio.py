@@ -0,0 +1,278 @@
+import asyncio
+import functools
+import logging
+
+from . import config
+from .dedup import SeenVideos
+from .executor import get_pool
+from .jsonstream import JsonObjectStream, iter_json_objects
+from .metrics import STAGE_FAILURES, STAGE_SECONDS
+from .routes import (
+    delta_text,
+    enqueue_quizzes,
+    get_transcript,
+    get_youtube_fun_videos,
+    interleave_fun_videos,
+    lesson_outline,
+    lesson_plan_cache,
+    lesson_plan_key,
+    lesson_plan_messages,
+    lesson_request_key,
+    llm,
+    merge_keyword_slots,
+    message_text,
+    quiz_cache,
+    quiz_cache_key,
+    quiz_jobs,
+    quiz_messages,
+    search_study_videos,
+    shared_process_flight,
+    shared_quiz_flight,
+)
+from .schemas import (
+    LESSON_PLAN_TOOL,
+    LESSON_PLAN_TOOL_CHOICE,
+    QUIZ_TOOL,
+    QUIZ_TOOL_CHOICE,
+    lesson_queries,
+    validate_questions,
+)
+from .similarity import NearDuplicateFilter
+from .singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+# How often run_quiz re-checks a running prefetch job for the same video
+_JOB_POLL_INTERVAL = 0.1
+
+# Event-loop counterparts of routes.process_flight / routes.quiz_flight
+process_flight = AsyncSingleFlight()
+quiz_flight = AsyncSingleFlight()
+
+async def run_blocking(fn, *args, pool="search", **kwargs):
+    """
+    Runs a blocking call (yt_dlp, SQLite) on one of the shared thread pools without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(pool), functools.partial(fn, *args, **kwargs))
+
+
+async def stream_keywords_from_prompt(prompt):
+    """
+    Async variant of routes.stream_keywords_from_prompt, using the gateway's async OpenAI client.
+    """
+    key = lesson_plan_key(prompt)
+    cached = await run_blocking(lesson_plan_cache.get, key, pool="stage")
+    if cached is not None:
+        for keyword in cached:
+            yield keyword
+        return
+
+    stream = await llm.acreate(
+        model=config.LESSON_PLAN_MODEL,
+        messages=lesson_plan_messages(prompt),
+        tools=[LESSON_PLAN_TOOL],
+        tool_choice=LESSON_PLAN_TOOL_CHOICE,
+        max_tokens=config.LESSON_PLAN_MAX_TOKENS,
+        stream=True,
+    )
+
+    parser = JsonObjectStream()
+    seen = set()
+    keywords = []
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        for keyword in lesson_queries(parser.feed(delta_text(chunk.choices[0].delta)), seen):
+            keywords.append(keyword)
+            yield keyword
+
+    await run_blocking(lesson_plan_cache.set, key, keywords, pool="stage")
+
+
+async def _search(stage, fn, *args, deadline=None, **kwargs):
+    """
+    Runs one search on the search pool. A failed or slow search contributes nothing rather
+    than failing the lesson. As in TaskGraph, SEARCH_TIMEOUT only counts from when a pool
+    thread starts the search, so time spent queued behind other searches is not held
+    against it; `deadline` (a loop.time() value) bounds queueing and running together.
+    """
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+
+    def run():
+        loop.call_soon_threadsafe(started.set)
+        return fn(*args, **kwargs)
+
+    def remaining():
+        return None if deadline is None else max(0, deadline - loop.time())
+
+    future = asyncio.ensure_future(run_blocking(run))
+    try:
+        await asyncio.wait_for(started.wait(), remaining())
+        with STAGE_SECONDS.time(stage=stage):
+            timeout = config.SEARCH_TIMEOUT if deadline is None else min(config.SEARCH_TIMEOUT, remaining())
+            return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        future.cancel()  # Never starts if still queued; a running search finishes in the background
+        logger.warning("Search %r timed out", args[:1])
+        STAGE_FAILURES.inc(stage=stage, reason="timeout" if started.is_set() else "deadline")
+    except Exception as e:
+        logger.warning("Search %r failed: %s", args[:1], e)
+        STAGE_FAILURES.inc(stage=stage, reason="error")
+    return None
+
+
+async def coalesce(flight, shared, key, fn):
+    """
+    Async twin of routes.coalesce for coroutine functions.
+    """
+    if config.COALESCE_ACROSS_WORKERS:
+        return await flight.do(key, lambda: shared.ado(key, fn))
+    return await flight.do(key, fn)
+
+
+async def process_lesson(study_topic, duration, random_theme):
+    """
+    Async /process pipeline. Returns (payload, status).
+    Identical concurrent requests share one run.
+    """
+    key = lesson_request_key(study_topic, duration, random_theme)
+    payload, status, outline = await coalesce(
+        process_flight, shared_process_flight, key, lambda: run_lesson(study_topic, duration, random_theme)
+    )
+    return payload, status
+
+
+async def run_lesson(study_topic, duration, random_theme):
+    """
+    The fun search, the streamed lesson plan and every keyword search overlap on the event loop.
+    Returns (payload, status, outline), like routes.run_lesson.
+    """
+    seen = SeenVideos()
+    loop = asyncio.get_running_loop()
+    # Bounded like every other stage, so a slow backend can't hold up the finished lesson
+    fun_task = asyncio.create_task(_search(
+        "fun_videos", lambda: seen.claim(get_youtube_fun_videos(random_theme)), deadline=loop.time() + config.PIPELINE_DEADLINE
+    ))
+    search_tasks = []
+    keywords = []
+
+    async def plan():
+        unique = NearDuplicateFilter(study_topic)
+        deadline = None  # Keyword searches share SEARCH_DEADLINE from the first one, as in build_lesson_graph
+        async for keyword in stream_keywords_from_prompt(study_topic):
+            if not unique.admit(keyword):
+                continue
+            keywords.append(keyword)
+            if deadline is None:
+                deadline = loop.time() + config.SEARCH_DEADLINE
+            search_tasks.append(asyncio.create_task(
+                _search("search", search_study_videos, keyword, seen, duration=duration, deadline=deadline)
+            ))
+
+    try:
+        with STAGE_SECONDS.time(stage="keywords"):
+            await asyncio.wait_for(plan(), config.PIPELINE_DEADLINE)
+    except Exception as e:
+        STAGE_FAILURES.inc(stage="keywords", reason="error")
+        fun_task.cancel()
+        for task in search_tasks:
+            task.cancel()
+        return {"error": f"Error in GPT-4 call: {str(e)}"}, 500, None
+
+    slots = merge_keyword_slots(await asyncio.gather(*search_tasks))
+    useful_videos = [video for videos in slots for video in videos]
+    await run_blocking(enqueue_quizzes, useful_videos, pool="stage")
+    fun_videos = await fun_task or []
+
+    with STAGE_SECONDS.time(stage="interleave"):
+        return interleave_fun_videos(useful_videos, fun_videos), 200, lesson_outline(keywords, slots)
+
+
+async def create_quiz(subtitles):
+    """
+    Async variant of routes.create_quiz; repair rounds use the async client too.
+    """
+    try:
+        response = await llm.acreate(
+            model=config.QUIZ_MODEL,
+            messages=quiz_messages(subtitles),
+            tools=[QUIZ_TOOL],
+            tool_choice=QUIZ_TOOL_CHOICE,
+            max_tokens=config.QUIZ_MAX_TOKENS,
+        )
+        questions = validate_questions(iter_json_objects(message_text(response.choices[0].message)))
+    except Exception as e:
+        return {"error": f"Error in GPT-4 call: {str(e)}"}
+
+    questions = questions[:config.QUIZ_QUESTION_COUNT]
+    questions += await repair_questions(subtitles, questions)
+
+    if not questions:
+        return {"error": "GPT-4 did not return any valid quiz questions"}
+    return questions
+
+
+async def repair_questions(subtitles, questions):
+    """
+    Async variant of routes.repair_questions.
+    """
+    repaired = []
+    for _ in range(config.QUIZ_REPAIR_ATTEMPTS):
+        missing = config.QUIZ_QUESTION_COUNT - len(questions) - len(repaired)
+        if missing <= 0:
+            break
+        logger.info("Repairing %d quiz questions", missing)
+        try:
+            response = await llm.acreate(
+                model=config.QUIZ_MODEL,
+                messages=quiz_messages(subtitles, count=missing, avoid=[q["question"] for q in questions + repaired]),
+                tools=[QUIZ_TOOL],
+                tool_choice=QUIZ_TOOL_CHOICE,
+                max_tokens=config.QUIZ_MAX_TOKENS,
+            )
+            repaired += validate_questions(iter_json_objects(message_text(response.choices[0].message)))[:missing]
+        except Exception as e:
+            logger.warning("Quiz repair failed; keeping %d valid questions: %s", len(questions) + len(repaired), e)
+            break
+    return repaired
+
+
+async def process_quiz(youtube_id):
+    """
+    Async /quiz pipeline. Returns (payload, status).
+    Identical concurrent requests share one run.
+    """
+    return tuple(await coalesce(quiz_flight, shared_quiz_flight, youtube_id, lambda: run_quiz(youtube_id)))
+
+
+async def run_quiz(youtube_id):
+    """
+    Transcript, cached quiz or a new one. Returns (payload, status).
+    """
+    try:
+        # A prefetch job already writing this quiz leaves it in the quiz cache (waited for up to
+        # JOB_WAIT_TIMEOUT, then generated here); a queued one is not needed
+        loop = asyncio.get_running_loop()
+        give_up = loop.time() + config.JOB_WAIT_TIMEOUT
+        while await run_blocking(quiz_jobs.running, youtube_id, pool="stage"):
+            if loop.time() >= give_up:
+                break
+            await asyncio.sleep(_JOB_POLL_INTERVAL)
+        await run_blocking(quiz_jobs.cancel, youtube_id, pool="stage")
+        with STAGE_SECONDS.time(stage="transcript"):
+            transcript = await run_blocking(get_transcript, youtube_id)
+    except Exception as e:
+        return {"error": f"Error downloading subtitles: {str(e)}"}, 500
+
+    key = quiz_cache_key(youtube_id, transcript)
+    quiz = await run_blocking(quiz_cache.get, key, pool="stage")
+    if quiz is not None:
+        return quiz, 200
+
+    with STAGE_SECONDS.time(stage="quiz"):
+        quiz = await create_quiz(transcript["text"])
+    if not (isinstance(quiz, dict) and "error" in quiz):
+        await run_blocking(quiz_cache.set, key, quiz, pool="stage")
+    return quiz, 200
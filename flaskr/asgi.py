@@ -0,0 +1,121 @@
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+from . import config, create_app
+from .aio import process_lesson, process_quiz
+from .metrics import HTTP_IN_FLIGHT, HTTP_SECONDS, new_trace_id
+
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return None
+
+
+async def _send_json(send, scope, payload, status=200):
+    headers = [(b"content-type", b"application/json")]
+    origin = dict(scope["headers"]).get(b"origin", b"").decode("latin-1")
+    if origin in config.CORS_ORIGINS:
+        headers.append((b"access-control-allow-origin", origin.encode("latin-1")))
+        headers.append((b"vary", b"Origin"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": json.dumps(payload).encode("utf-8")})
+
+
+async def handle_process(scope, receive, send):
+    data = await _read_json(receive)
+    if not isinstance(data, dict):
+        return await _send_json(send, scope, {"error": "Request body must be a JSON object"}, 400)
+
+    # Extract parameters
+    study_topic = data.get("studyTopic")
+    duration = data.get("duration", "medium")  # Use "medium" as default
+    random_theme = data.get("randomTheme")
+
+    if not study_topic:
+        return await _send_json(send, scope, {"error": "No study topic provided"}, 400)
+    if not random_theme:
+        return await _send_json(send, scope, {"error": "No random theme provided"}, 400)
+
+    payload, status = await process_lesson(study_topic, duration, random_theme)
+    await _send_json(send, scope, payload, status)
+
+
+async def handle_quiz(scope, receive, send):
+    data = await _read_json(receive)
+    if not isinstance(data, dict):
+        return await _send_json(send, scope, {"error": "Request body must be a JSON object"}, 400)
+
+    youtube_id = data.get("youtubeId")
+    if not youtube_id:
+        return await _send_json(send, scope, {"error": "No YouTube ID provided"}, 400)
+
+    payload, status = await process_quiz(youtube_id)
+    await _send_json(send, scope, payload, status)
+
+
+class AsyncApp:
+    """
+    ASGI front for the backend.
+    The slow endpoints (/process, /quiz) run natively on the event loop, so one process can
+    hold hundreds of in-flight lessons. Every other request, including CORS preflights,
+    is handed to the regular Flask app.
+    """
+
+    def __init__(self, wsgi_app):
+        self.fallback = WsgiToAsgi(wsgi_app)
+        self.routes = {
+            ("POST", "/process"): handle_process,
+            ("POST", "/quiz"): handle_quiz,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": message["type"] + ".complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+
+        handler = self.routes.get((scope.get("method"), scope.get("path")))
+        if scope["type"] == "http" and handler is not None:
+            return await self.traced(handler, scope, receive, send)
+        return await self.fallback(scope, receive, send)
+
+    async def traced(self, handler, scope, receive, send):
+        """
+        Runs a native handler under its own trace ID, with the same request metrics as the Flask routes.
+        """
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        trace = new_trace_id(incoming or None)
+        status = {"code": 500}
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-request-id", trace.encode("latin-1"))]}
+            await send(message)
+
+        start = time.perf_counter()
+        with HTTP_IN_FLIGHT.track(endpoint=scope["path"]):
+            try:
+                return await handler(scope, receive, send_traced)
+            finally:
+                HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=scope["path"], method=scope["method"], status=status["code"])
+
+
+def create_asgi_app():
+    return AsyncApp(create_app())
+
+
+# Run with: uvicorn flaskr.asgi:app --port 5000
+app = create_asgi_app()
@@ -0,0 +1,188 @@
+import logging
+import re
+import threading
+
+from . import config, httpclient
+from .ydl import pool as ydl_pool
+
+logger = logging.getLogger(__name__)
+
+
+def parse_duration(text):
+    """
+    Converts "1:02:03" / "4:13" style durations to seconds. Returns None when unknown (e.g. live).
+    """
+    if isinstance(text, (int, float)):
+        return text or None
+    try:
+        seconds = 0
+        for part in str(text).split(":"):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def parse_view_count(text):
+    """
+    Converts "1,234,567 views" / "No views" style counts to an int. Returns None when unknown.
+    """
+    if isinstance(text, int):
+        return text
+    if not text:
+        return None
+    digits = re.sub(r"\D", "", str(text))
+    if digits:
+        return int(digits)
+    return 0 if str(text).lower().startswith("no ") else None
+
+
+def _text(node):
+    # InnerTube text is either {"simpleText": "..."} or {"runs": [{"text": "..."}, ...]}
+    if not node:
+        return None
+    if "simpleText" in node:
+        return node["simpleText"]
+    return "".join(run.get("text", "") for run in node.get("runs", [])) or None
+
+
+class SearchBackend:
+    """
+    A way of running a YouTube keyword search. search() returns up to `count` raw entries,
+    each a dict with "id", "title", "url", "channel", "duration" (seconds or None) and
+    "view_count" (or None), the same shape yt_dlp's flat search entries have.
+    """
+
+    name = None
+
+    def search(self, query, count):
+        raise NotImplementedError
+
+
+class YtDlpBackend(SearchBackend):
+    """
+    yt_dlp's ytsearch extractor, on pooled YoutubeDL instances. The most robust backend.
+    """
+
+    name = "yt_dlp"
+    # The result count lives in the "ytsearchN:" prefix, so one option set serves every search
+    OPTIONS = {
+        "quiet": True,
+        "extract_flat": True,  # Extract metadata without downloading
+        "force_generic_extractor": True,
+        "default_search": "ytsearch",
+    }
+
+    def search(self, query, count):
+        with ydl_pool.checkout(self.OPTIONS) as ydl:
+            search_results = ydl.extract_info(f"ytsearch{count}:{query}", download=False)
+
+        return list(search_results.get("entries") or [])
+
+
+class InnerTubeBackend(SearchBackend):
+    """
+    Calls YouTube's own JSON search endpoint (the one youtube.com uses) directly.
+    One small POST per page of ~20 results, with continuation tokens for deeper pages.
+    """
+
+    name = "innertube"
+    URL = "https://www.youtube.com/youtubei/v1/search?prettyPrint=false"
+    VIDEOS_ONLY = "EgIQAQ=="  # Search filter: type = video
+
+    def _post(self, body):
+        return httpclient.post(self.URL, json=body, timeout=config.SEARCH_TIMEOUT).json()
+
+    def search(self, query, count):
+        context = {"client": {"clientName": "WEB", "clientVersion": config.INNERTUBE_CLIENT_VERSION, "hl": "en", "gl": "US"}}
+        data = self._post({"context": context, "query": query, "params": self.VIDEOS_ONLY})
+
+        entries = []
+        seen = set()
+        while True:
+            renderers, token = self._walk(data)
+            for renderer in renderers:
+                video_id = renderer.get("videoId")
+                if not video_id or video_id in seen:
+                    continue
+                seen.add(video_id)
+                entries.append({
+                    "id": video_id,
+                    "title": _text(renderer.get("title")),
+                    "url": f"https://www.youtube.com/watch?v={video_id}",
+                    "channel": _text(renderer.get("ownerText")) or _text(renderer.get("longBylineText")),
+                    "duration": parse_duration(_text(renderer.get("lengthText"))),
+                    "view_count": parse_view_count(_text(renderer.get("viewCountText"))),
+                })
+            if len(entries) >= count or not token or not renderers:
+                return entries[:count]
+            data = self._post({"context": context, "continuation": token})
+
+    # Sponsored results; they can embed ordinary-looking video renderers
+    AD_RENDERERS = ("adSlotRenderer", "searchPyvRenderer", "promotedSparklesWebRenderer", "promotedVideoRenderer")
+
+    def _walk(self, node):
+        # The response nests results differently for first pages and continuations,
+        # so collect every videoRenderer, and the next page's token from the
+        # continuationItemRenderer, wherever they are. Ads are skipped whole.
+        renderers, token = [], None
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, dict):
+                if "videoRenderer" in item:
+                    renderers.append(item["videoRenderer"])
+                    continue
+                if any(name in item for name in self.AD_RENDERERS):
+                    continue
+                if "continuationItemRenderer" in item:
+                    command = item["continuationItemRenderer"].get("continuationEndpoint", {}).get("continuationCommand", {})
+                    token = command.get("token") or token
+                    continue
+                stack.extend(reversed(list(item.values())))
+            elif isinstance(item, list):
+                stack.extend(reversed(item))
+        return renderers, token
+
+
+class YoutubeSearchBackend(SearchBackend):
+    """
+    The youtube-search package: scrapes the embedded JSON of the results page.
+    Only ever sees the first page (~20 results), and makes its own unpooled requests.
+    """
+
+    name = "youtube_search"
+
+    def search(self, query, count):
+        from youtube_search import YoutubeSearch
+
+        entries = []
+        for result in YoutubeSearch(query, max_results=count).to_dict():
+            entries.append({
+                "id": result.get("id"),
+                "title": result.get("title"),
+                "url": f"https://www.youtube.com{result.get('url_suffix')}" if result.get("url_suffix") else None,
+                "channel": result.get("channel"),
+                "duration": parse_duration(result.get("duration")),
+                "view_count": parse_view_count(result.get("views")),
+            })
+        return entries
+
+
+BACKENDS = {backend.name: backend for backend in (YtDlpBackend, InnerTubeBackend, YoutubeSearchBackend)}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    """
+    Returns the shared instance of the named backend (SEARCH_BACKEND by default).
+    """
+    name = name or config.SEARCH_BACKEND
+    with _instances_lock:
+        if name not in _instances:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown search backend {name!r}; choose from {', '.join(BACKENDS)}")
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import config
+from .executor import get_pool
+
+logger = logging.getLogger(__name__)
+
+# How many writes between sweeps of the on-disk tier
+_PRUNE_EVERY = 100
+
+
+def normalize_text(text):
+    """
+    Lower-cases and collapses whitespace so trivially different spellings share a cache entry.
+    """
+    return " ".join(str(text).lower().split())
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-memory LRU in front of a SQLite table that survives restarts.
+    Entries are fresh for `ttl` seconds. After that they are still served for up to
+    `stale_ttl` seconds while a background refresh runs (stale-while-revalidate).
+    Keys are any JSON-serialisable value (tuples work); values must be JSON-serialisable.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=0, max_memory=1024, max_disk=10000, path=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        # An empty CACHE_DIR turns the on-disk tier off
+        if path is None and config.CACHE_DIR:
+            path = os.path.join(config.CACHE_DIR, "cache.sqlite")
+        self.path = path
+
+        self._memory = OrderedDict()  # key -> (stored_at, value), oldest first
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._refreshing = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, key):
+        return json.dumps(key, sort_keys=True, separators=(",", ":"))
+
+    def _connect(self):
+        # Caller holds self._db_lock
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, stored_at REAL NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, entry):
+        # Caller holds self._lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        if not self.path:
+            return None
+        try:
+            with self._db_lock:
+                row = self._connect().execute(
+                    "SELECT stored_at, value FROM cache WHERE namespace = ? AND key = ?", (self.name, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Cache %s: disk read failed: %s", self.name, e)
+            return None
+        if row is None:
+            return None
+
+        entry = (row[0], json.loads(row[1]))
+        with self._lock:
+            self._remember(key, entry)  # Promote to the memory tier
+        return entry
+
+    def _store(self, key, value, stored_at=None):
+        entry = (time.time() if stored_at is None else stored_at, value)
+        with self._lock:
+            self._remember(key, entry)
+
+        if not self.path:
+            return
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, stored_at, value) VALUES (?, ?, ?, ?)",
+                    (self.name, key, entry[0], json.dumps(value)),
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune(db)
+                db.commit()
+        except sqlite3.Error as e:
+            logger.warning("Cache %s: disk write failed: %s", self.name, e)
+
+    def _prune(self, db):
+        # Caller holds self._db_lock. Drops dead entries, then the oldest ones over max_disk.
+        db.execute(
+            "DELETE FROM cache WHERE namespace = ? AND stored_at < ?",
+            (self.name, time.time() - self.ttl - self.stale_ttl),
+        )
+        db.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.name, self.name, self.max_disk),
+        )
+
+    def get(self, key, default=None):
+        """
+        Returns the fresh value for `key`, or `default`. Stale entries count as misses here.
+        """
+        entry = self._lookup(self._key(key))
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        self._store(self._key(key), value)
+
+    def delete(self, key):
+        key = self._key(key)
+        with self._lock:
+            self._memory.pop(key, None)
+        if not self.path:
+            return
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.name, key))
+                db.commit()
+        except sqlite3.Error as e:
+            logger.warning("Cache %s: disk delete failed: %s", self.name, e)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for `key`, calling `compute()` on a miss.
+        A stale hit is returned immediately and refreshed on the stage pool in the background.
+        Exceptions from `compute()` propagate and nothing is cached.
+        """
+        cache_key = self._key(key)
+        entry = self._lookup(cache_key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                self._refresh(cache_key, compute)
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self._store(cache_key, value)
+        return value
+
+    def _refresh(self, cache_key, compute):
+        with self._lock:
+            if cache_key in self._refreshing:
+                return  # Someone is already revalidating this entry
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                self._store(cache_key, compute())
+            except Exception as e:
+                logger.warning("Cache %s: background refresh failed: %s", self.name, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(cache_key)
+
+        get_pool("stage").submit(refresh)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
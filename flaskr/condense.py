@@ -0,0 +1,99 @@
+import math
+import re
+from collections import namedtuple
+
+from . import config
+from .vtt import Segment, iter_segments
+
+Condensed = namedtuple("Condensed", ["text", "tokens", "source_tokens"])
+
+# Words that carry no meaning in spoken transcripts
+FILLER_WORDS = {"um", "umm", "uh", "uhh", "erm", "er", "hmm", "mm", "mhm", "ah"}
+_SOUND_TAG = re.compile(r"\[[^\]]*\]")  # [Music], [Applause], [Laughter]
+_WORD = re.compile(r"\S+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate for English prose (roughly 4 tokens per 3 words).
+    Good enough to keep prompts inside a budget without a tokenizer dependency.
+    """
+    return math.ceil(len(_WORD.findall(text)) * 4 / 3)
+
+
+def clean_text(text):
+    """
+    Drops sound tags, filler words and immediately repeated words ("the the").
+    """
+    words = []
+    for word in _SOUND_TAG.sub(" ", text).split():
+        bare = word.lower().strip(",.!?")
+        if bare in FILLER_WORDS:
+            continue
+        if words and bare == words[-1].lower().strip(",.!?"):
+            continue
+        words.append(word)
+    return " ".join(words)
+
+
+def _segments(transcript):
+    segments = list(iter_segments(transcript.splitlines()))
+    if segments:
+        return segments
+    # Not WebVTT: treat each sentence as one step on the timeline
+    return [Segment(index, index + 1, sentence) for index, sentence in enumerate(_SENTENCE.split(transcript))]
+
+
+def condense_transcript(transcript, budget=None, chunks=None):
+    """
+    Fits a transcript (WebVTT or plain text) into roughly `budget` tokens.
+    The timeline is cut into `chunks` equal windows (at least one) and each window gets an
+    equal share of the budget, so the result samples the whole video instead of just its opening.
+    Returns Condensed(text, tokens, source_tokens).
+    """
+    budget = config.QUIZ_TRANSCRIPT_TOKENS if budget is None else budget
+    chunks = max(1, config.QUIZ_TRANSCRIPT_CHUNKS if chunks is None else chunks)  # 0 would mean no windows at all
+
+    segments = []
+    seen = set()
+    for segment in _segments(transcript):
+        text = clean_text(segment.text)
+        if not text or text.lower() in seen:  # Repeated lines and choruses add nothing
+            continue
+        seen.add(text.lower())
+        segments.append(segment._replace(text=text))
+    if not segments:
+        return Condensed("", 0, 0)
+
+    costs = [estimate_tokens(segment.text) for segment in segments]
+    source_tokens = sum(costs)
+    if source_tokens <= budget:
+        text = " ".join(segment.text for segment in segments)
+        return Condensed(text, estimate_tokens(text), source_tokens)
+
+    # **Bucket segments into equal slices of the timeline**
+    start, end = segments[0].start, segments[-1].end
+    span = max(end - start, 1e-9)
+    windows = [[] for _ in range(chunks)]
+    for segment, cost in zip(segments, costs):
+        index = min(int((segment.start - start) / span * chunks), chunks - 1)
+        windows[index].append((segment, cost))
+
+    # Budget left unused by short windows rolls over to the windows after them
+    parts = []
+    remaining = budget
+    for position, window in enumerate(windows):
+        share = remaining // max(chunks - position, 1)
+        taken, spent = [], 0
+        for segment, cost in window:
+            if spent + cost > share:
+                break
+            taken.append(segment.text)
+            spent += cost
+        if taken:
+            parts.append(" ".join(taken))
+        remaining -= spent
+
+    text = " … ".join(parts)
+    return Condensed(text, estimate_tokens(text), source_tokens)
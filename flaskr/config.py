@@ -0,0 +1,101 @@
+import os
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+
+# Frontend origins allowed to call the API
+CORS_ORIGINS = [origin.strip() for origin in os.environ.get("CORS_ORIGINS", "http://localhost:4173,http://localhost:5173").split(",")]
+
+# Models
+LESSON_PLAN_MODEL = os.environ.get("LESSON_PLAN_MODEL", "gpt-4")
+QUIZ_MODEL = os.environ.get("QUIZ_MODEL", "gpt-4")
+LESSON_PLAN_MAX_TOKENS = int(os.environ.get("LESSON_PLAN_MAX_TOKENS", 600))  # Room for ~10 structured lesson steps
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))  # Seconds a single LLM call may run
+
+# LLM gateway (see flaskr/llm.py)
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", 8))  # Concurrent LLM calls per process
+LLM_REQUESTS_PER_SECOND = float(os.environ.get("LLM_REQUESTS_PER_SECOND", 3))  # Average call rate; 0 disables the limiter
+LLM_BURST = int(os.environ.get("LLM_BURST", 6))  # Calls allowed back to back before the rate applies
+LLM_RETRIES = int(os.environ.get("LLM_RETRIES", 4))  # Retries on 429s, 5xxs, timeouts and connection errors
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", 0.5))  # Seconds; doubles per retry, fully jittered
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", 20))  # Longest single wait, including Retry-After hints
+
+# Quiz generation
+QUIZ_QUESTION_COUNT = int(os.environ.get("QUIZ_QUESTION_COUNT", 8))
+QUIZ_MAX_TOKENS = int(os.environ.get("QUIZ_MAX_TOKENS", 1200))  # Room for every question with its four options
+QUIZ_REPAIR_ATTEMPTS = int(os.environ.get("QUIZ_REPAIR_ATTEMPTS", 2))  # Rounds spent replacing invalid questions
+
+# Quiz transcript condensing (see flaskr/condense.py)
+QUIZ_TRANSCRIPT_TOKENS = int(os.environ.get("QUIZ_TRANSCRIPT_TOKENS", 1500))  # Token budget for the transcript in the quiz prompt
+QUIZ_TRANSCRIPT_CHUNKS = int(os.environ.get("QUIZ_TRANSCRIPT_CHUNKS", 8))  # Equal slices of the video timeline sampled
+
+# Keyword search fan-out (see flaskr/executor.py)
+SEARCH_POOL_SIZE = int(os.environ.get("SEARCH_POOL_SIZE", 8))  # Max searches running at once
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT", 15))  # Seconds a single search may run
+SEARCH_DEADLINE = float(os.environ.get("SEARCH_DEADLINE", 30))  # Seconds for the whole fan-out
+
+# Search backend (see flaskr/backends.py): "yt_dlp", "innertube" or "youtube_search"
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "yt_dlp")
+INNERTUBE_CLIENT_VERSION = os.environ.get("INNERTUBE_CLIENT_VERSION", "2.20250101.00.00")
+
+# Shared outbound HTTP client (see flaskr/httpclient.py)
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 32))  # Max open connections
+HTTP_KEEPALIVE = int(os.environ.get("HTTP_KEEPALIVE", 16))  # Idle connections kept open
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 60))  # Seconds an idle connection is kept
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 15))  # Seconds per request
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 1))  # Connection-level retries
+HTTP2 = os.environ.get("HTTP2", "1") != "0"  # Only takes effect when the h2 package is installed
+
+# Reusable yt_dlp.YoutubeDL instances (see flaskr/ydl.py)
+YDL_POOL_SIZE = int(os.environ.get("YDL_POOL_SIZE", 8))  # Idle instances kept per option set
+YDL_MAX_USES = int(os.environ.get("YDL_MAX_USES", 500))  # Checkouts before an instance is replaced
+YDL_WARM = int(os.environ.get("YDL_WARM", 2))  # Search instances built in the background at startup
+
+# Adaptive over-fetch for duration-filtered searches (see flaskr/adaptive.py)
+SEARCH_ADAPTIVE = os.environ.get("SEARCH_ADAPTIVE", "1") != "0"
+SEARCH_OVERFETCH_MARGIN = float(os.environ.get("SEARCH_OVERFETCH_MARGIN", 1.2))  # Extra headroom on top of the pass-rate estimate
+SEARCH_MAX_FETCH = int(os.environ.get("SEARCH_MAX_FETCH", 40))  # Most raw results fetched for one keyword
+
+# Near-duplicate keyword collapsing (see flaskr/similarity.py)
+KEYWORD_SIMILARITY_THRESHOLD = float(os.environ.get("KEYWORD_SIMILARITY_THRESHOLD", 0.75))  # Jaccard overlap at which two queries count as one
+
+# /process task graph (see flaskr/pipeline.py)
+STAGE_POOL_SIZE = int(os.environ.get("STAGE_POOL_SIZE", 8))  # Threads for non-search stages (GPT calls etc.)
+PIPELINE_DEADLINE = float(os.environ.get("PIPELINE_DEADLINE", 60))  # Seconds for the whole /process pipeline
+
+# Coalescing of identical concurrent /process and /quiz requests (see flaskr/singleflight.py)
+COALESCE_ACROSS_WORKERS = os.environ.get("COALESCE_ACROSS_WORKERS", "0") != "0"  # Also share work between worker processes (needs CACHE_DIR)
+COALESCE_RESULT_TTL = int(os.environ.get("COALESCE_RESULT_TTL", 30))  # Seconds a shared result stays readable by other workers
+
+# Background quiz pre-generation for /process playlists (see flaskr/jobqueue.py)
+QUIZ_PREFETCH_COUNT = int(os.environ.get("QUIZ_PREFETCH_COUNT", 3))  # Study videos per playlist to pre-generate quizzes for; 0 disables
+QUIZ_PREFETCH_WORKERS = int(os.environ.get("QUIZ_PREFETCH_WORKERS", 2))  # Worker threads per process
+JOB_LEASE = float(os.environ.get("JOB_LEASE", 30))  # Seconds without a worker heartbeat before a claimed job is handed out again
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 2))
+JOB_KEEP = float(os.environ.get("JOB_KEEP", 86400))  # Seconds finished jobs are kept in the queue table
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 5))  # Seconds between idle checks for jobs from other processes
+JOB_WAIT_TIMEOUT = float(os.environ.get("JOB_WAIT_TIMEOUT", 10))  # Longest /quiz waits on a prefetch job for its video before generating inline
+
+# Lesson jobs: POST /lessons, GET /lessons/<id>
+LESSON_JOB_POOL_SIZE = int(os.environ.get("LESSON_JOB_POOL_SIZE", 4))  # Lesson jobs driven at once per process
+LESSON_JOB_TTL = int(os.environ.get("LESSON_JOB_TTL", 24 * 60 * 60))  # Seconds a job and its checkpoints are kept
+LESSON_JOB_STALE = float(os.environ.get("LESSON_JOB_STALE", 120))  # Seconds without progress before a running job may be resumed
+
+# Caches (see flaskr/cache.py). An empty CACHE_DIR keeps every cache in memory only.
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 24 * 3600))  # Seconds a search result is fresh
+SEARCH_CACHE_STALE_TTL = float(os.environ.get("SEARCH_CACHE_STALE_TTL", 7 * 24 * 3600))  # Extra seconds served stale while refreshing
+SEARCH_CACHE_MAX_MEMORY = int(os.environ.get("SEARCH_CACHE_MAX_MEMORY", 1024))  # Entries kept in the in-memory LRU
+SEARCH_CACHE_MAX_DISK = int(os.environ.get("SEARCH_CACHE_MAX_DISK", 50000))  # Entries kept on disk
+
+LESSON_PLAN_CACHE_TTL = float(os.environ.get("LESSON_PLAN_CACHE_TTL", 7 * 24 * 3600))  # Seconds a lesson plan is reused
+LESSON_PLAN_CACHE_MAX_MEMORY = int(os.environ.get("LESSON_PLAN_CACHE_MAX_MEMORY", 512))
+LESSON_PLAN_CACHE_MAX_DISK = int(os.environ.get("LESSON_PLAN_CACHE_MAX_DISK", 20000))
+
+TRANSCRIPT_CACHE_TTL = float(os.environ.get("TRANSCRIPT_CACHE_TTL", 30 * 24 * 3600))  # Seconds a downloaded transcript is reused
+TRANSCRIPT_CACHE_MAX_MEMORY = int(os.environ.get("TRANSCRIPT_CACHE_MAX_MEMORY", 256))
+TRANSCRIPT_CACHE_MAX_DISK = int(os.environ.get("TRANSCRIPT_CACHE_MAX_DISK", 5000))
+
+QUIZ_CACHE_TTL = float(os.environ.get("QUIZ_CACHE_TTL", 30 * 24 * 3600))  # Seconds a generated quiz is reused
+QUIZ_CACHE_MAX_MEMORY = int(os.environ.get("QUIZ_CACHE_MAX_MEMORY", 512))
+QUIZ_CACHE_MAX_DISK = int(os.environ.get("QUIZ_CACHE_MAX_DISK", 20000))
@@ -0,0 +1,61 @@
+import re
+import threading
+from urllib.parse import parse_qs, urlparse
+
+_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def video_id(video):
+    """
+    Canonical YouTube video ID for a video dict (or a bare URL), or None if there isn't one.
+    Handles watch?v=, youtu.be/, /shorts/ and /embed/ URLs.
+    """
+    if isinstance(video, dict):
+        if video.get("id") and _ID.match(video["id"]):
+            return video["id"]
+        url = video.get("url") or ""
+    else:
+        url = video or ""
+
+    if _ID.match(url):
+        return url
+    parsed = urlparse(url)
+    candidates = parse_qs(parsed.query).get("v", [])
+    if parsed.netloc.endswith("youtu.be"):
+        candidates.append(parsed.path.lstrip("/"))
+    parts = parsed.path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+        candidates.append(parts[1])
+    for candidate in candidates:
+        if _ID.match(candidate):
+            return candidate
+    return None
+
+
+class SeenVideos:
+    """
+    Video IDs already placed in one /process playlist, shared by its concurrent searches.
+    claim() is atomic, so two searches that find the same video can't both keep it.
+    """
+
+    def __init__(self):
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def claim(self, videos, limit=None):
+        """
+        Returns the videos whose IDs haven't been seen, in order, and marks them seen.
+        With `limit`, stops after that many, leaving the rest unclaimed for other searches.
+        Videos without a recognisable ID are keyed by URL.
+        """
+        fresh = []
+        with self._lock:
+            for video in videos:
+                if limit is not None and len(fresh) >= limit:
+                    break
+                key = video_id(video) or video.get("url")
+                if key in self._ids:
+                    continue
+                self._ids.add(key)
+                fresh.append(video)
+        return fresh
@@ -0,0 +1,97 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+# How often the wait loop wakes up to check per-call timeouts
+_POLL_INTERVAL = 0.25
+
+
+class _ContextPool(ThreadPoolExecutor):
+    """
+    Runs each call in a copy of the submitter's context, so the request's trace ID
+    (see metrics.trace_id) follows work onto pool threads.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _pool_size(name):
+    return {
+        "search": config.SEARCH_POOL_SIZE,
+        "stage": config.STAGE_POOL_SIZE,
+        "job": config.LESSON_JOB_POOL_SIZE,
+    }[name]
+
+
+def get_pool(name="search"):
+    """
+    Returns the process-wide thread pool called `name` ("search" for outbound searches,
+    "stage" for other pipeline stages, "job" for background lesson jobs driving a pipeline).
+    Keeping them apart means slow GPT calls can never occupy every search slot, and job
+    drivers can never occupy the threads their own stages need.
+    Pools are created lazily so sizes can be changed through config before first use.
+    """
+    with _pool_lock:
+        if name not in _pools:
+            _pools[name] = _ContextPool(max_workers=_pool_size(name), thread_name_prefix=name)
+        return _pools[name]
+
+
+def map_ordered(fn, items, timeout=None, deadline=None, pool="search", label="Call"):
+    """
+    Runs fn(item) for every item on the named pool and returns the results in input order.
+    A call that raises, runs longer than `timeout` seconds, or is unfinished when the
+    overall `deadline` passes comes back as None so one slow call can't sink the batch.
+    `label` names the calls in log messages.
+    """
+    timeout = config.SEARCH_TIMEOUT if timeout is None else timeout
+    deadline = config.SEARCH_DEADLINE if deadline is None else deadline
+
+    pool = get_pool(pool)
+    started = {}  # item index -> time its call actually began running
+
+    def run(index, item):
+        started[index] = time.monotonic()
+        return fn(item)
+
+    futures = {pool.submit(run, index, item): index for index, item in enumerate(items)}
+    results = [None] * len(futures)
+    pending = set(futures)
+    end = time.monotonic() + deadline
+
+    while pending:
+        now = time.monotonic()
+        if now >= end:
+            break
+
+        # **Drop calls that have been running longer than the per-call timeout**
+        for future in list(pending):
+            began = started.get(futures[future])
+            if began is not None and now - began > timeout:
+                logger.warning("%s for %r timed out after %.1fs", label, items[futures[future]], timeout)
+                pending.discard(future)
+
+        done, pending = wait(pending, timeout=min(_POLL_INTERVAL, end - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logger.warning("%s for %r failed: %s", label, items[index], e)
+
+    for future in pending:
+        future.cancel()  # Queued calls never start; running ones finish in the background
+    if pending:
+        logger.warning("%s deadline of %.1fs hit with %d calls unfinished", label, deadline, len(pending))
+
+    return results
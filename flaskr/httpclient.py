@@ -0,0 +1,74 @@
+import logging
+import threading
+
+import httpx
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client = None
+_client_lock = threading.Lock()
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def get_client():
+    """
+    Returns the process-wide httpx client used for outbound YouTube and subtitle requests.
+    Connections are kept alive and shared between threads, so repeated requests to the same
+    hosts skip the TCP and TLS handshakes; with h2 installed they are multiplexed over HTTP/2.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            http2 = config.HTTP2 and HTTP2_AVAILABLE
+            limits = httpx.Limits(
+                max_connections=config.HTTP_POOL_SIZE,
+                max_keepalive_connections=config.HTTP_KEEPALIVE,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            )
+            # httpx ignores the client's limits and http2 once a transport is given, so they go here
+            _client = httpx.Client(
+                headers=HEADERS,
+                timeout=config.HTTP_TIMEOUT,
+                follow_redirects=True,
+                transport=httpx.HTTPTransport(http2=http2, limits=limits, retries=config.HTTP_RETRIES),
+            )
+            logger.info("HTTP client ready (HTTP/2 %s)", "on" if http2 else "off")
+        return _client
+
+
+def get(url, **kwargs):
+    """
+    GET on the shared client. Raises httpx.HTTPStatusError for non-2xx responses.
+    """
+    response = get_client().get(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+def post(url, **kwargs):
+    """
+    POST on the shared client. Raises httpx.HTTPStatusError for non-2xx responses.
+    """
+    response = get_client().post(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+def close():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
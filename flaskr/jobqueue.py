@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from . import config
+from .metrics import new_trace_id
+
+logger = logging.getLogger(__name__)
+
+# How many finished jobs between sweeps of old rows
+_PRUNE_EVERY = 100
+
+# How often wait() re-checks a running job
+_WAIT_INTERVAL = 0.1
+
+
+class JobQueue:
+    """
+    Persistent priority queue of background jobs in SQLite, safe to share between threads
+    and between worker processes on one host.
+    Each job has a `key`; enqueueing a key that is already queued or running returns the
+    existing job (raising its priority if needed) instead of adding a second one.
+    Jobs are claimed atomically, highest priority first, and a claim is a lease that the
+    worker keeps renewing (see Workers): a job whose worker died or was restarted is handed
+    out again, and stops counting as running, once `lease` seconds pass without a heartbeat.
+    """
+
+    def __init__(self, name, path=None, lease=None, max_attempts=None, keep=None):
+        self.name = name
+        self.lease = config.JOB_LEASE if lease is None else lease
+        self.max_attempts = config.JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.keep = config.JOB_KEEP if keep is None else keep  # Seconds finished jobs stay visible
+        # An empty CACHE_DIR keeps the queue in memory (lost on restart, not shared between workers)
+        if path is None:
+            path = os.path.join(config.CACHE_DIR, "jobs.sqlite") if config.CACHE_DIR else ":memory:"
+        self.path = path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._finished = 0
+        self.wakeup = threading.Event()
+
+    def _connect(self):
+        # Caller holds self._db_lock
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            if self.path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, queue TEXT NOT NULL, key TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "payload TEXT NOT NULL, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, UNIQUE (queue, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, state, priority DESC, id)")
+        return self._db
+
+    def _transaction(self, fn):
+        with self._db_lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")  # Takes the write lock up front, so claims never race
+            try:
+                result = fn(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+    def enqueue(self, key, payload, priority=0):
+        """
+        Queues a job unless one with the same key is already queued or running.
+        Finished, failed and cancelled jobs with the key are started afresh. Returns the job id.
+        """
+        def enqueue(db):
+            now = time.time()
+            row = db.execute("SELECT id, state, priority FROM jobs WHERE queue = ? AND key = ?", (self.name, key)).fetchone()
+            if row is None:
+                cursor = db.execute(
+                    "INSERT INTO jobs (queue, key, priority, payload, state, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    (self.name, key, priority, json.dumps(payload), now, now),
+                )
+                return cursor.lastrowid
+            job_id, state, current = row
+            if state in ("queued", "running"):
+                if priority > current:
+                    db.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+                return job_id
+            db.execute(
+                "UPDATE jobs SET priority = ?, payload = ?, state = 'queued', attempts = 0, error = NULL, "
+                "created_at = ?, updated_at = ? WHERE id = ?",
+                (priority, json.dumps(payload), now, now, job_id),
+            )
+            return job_id
+
+        job_id = self._transaction(enqueue)
+        self.wakeup.set()
+        return job_id
+
+    def claim(self):
+        """
+        Takes the highest-priority ready job, or a running job whose lease has expired.
+        Returns (id, key, payload) or None.
+        """
+        def claim(db):
+            now = time.time()
+            row = db.execute(
+                "SELECT id, key, payload FROM jobs WHERE queue = ? AND "
+                "(state = 'queued' OR (state = 'running' AND updated_at < ?)) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (self.name, now - self.lease),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (now, row[0]),
+            )
+            return row[0], row[1], json.loads(row[2])
+
+        return self._transaction(claim)
+
+    def complete(self, job_id):
+        self._finish(job_id, "done", None)
+
+    def fail(self, job_id, error):
+        """
+        Records a failed attempt; the job goes back in the queue until it has used max_attempts.
+        """
+        def fail(db):
+            row = db.execute("SELECT attempts, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[1] != "running":
+                return
+            state = "queued" if row[0] < self.max_attempts else "failed"
+            db.execute("UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ?", (state, str(error), time.time(), job_id))
+
+        self._transaction(fail)
+
+    def _finish(self, job_id, state, error):
+        def finish(db):
+            # A job cancelled while it ran stays cancelled
+            db.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ? AND state = 'running'",
+                (state, error, time.time(), job_id),
+            )
+            self._finished += 1
+            if self._finished % _PRUNE_EVERY == 0:
+                db.execute(
+                    "DELETE FROM jobs WHERE queue = ? AND state IN ('done', 'failed', 'cancelled') AND updated_at < ?",
+                    (self.name, time.time() - self.keep),
+                )
+
+        self._transaction(finish)
+
+    def cancel(self, key):
+        """
+        Cancels the job for `key` if it has not finished. A running job is not interrupted,
+        but it will not be retried. Returns True if a job was cancelled.
+        """
+        def cancel(db):
+            cursor = db.execute(
+                "UPDATE jobs SET state = 'cancelled', updated_at = ? WHERE queue = ? AND key = ? AND state IN ('queued', 'running')",
+                (time.time(), self.name, key),
+            )
+            return cursor.rowcount > 0
+
+        return self._transaction(cancel)
+
+    def state(self, key):
+        with self._db_lock:
+            row = self._connect().execute("SELECT state FROM jobs WHERE queue = ? AND key = ?", (self.name, key)).fetchone()
+        return row[0] if row else None
+
+    def running(self, key):
+        """
+        Whether a live worker (one whose lease has not expired) is running the job for `key`.
+        """
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM jobs WHERE queue = ? AND key = ? AND state = 'running' AND updated_at >= ?",
+                (self.name, key, time.time() - self.lease),
+            ).fetchone()
+        return row is not None
+
+    def wait(self, key, timeout=None, poll=_WAIT_INTERVAL):
+        """
+        Blocks while the job for `key` is running, in this process or another, for at most
+        `timeout` seconds (JOB_WAIT_TIMEOUT by default).
+        Returns False if the job was still running when the timeout ran out.
+        """
+        timeout = config.JOB_WAIT_TIMEOUT if timeout is None else timeout
+        end = time.time() + timeout
+        while self.running(key):
+            if time.time() >= end:
+                logger.info("Job queue %s: %s still running after %.0fs; not waiting any longer", self.name, key, timeout)
+                return False
+            time.sleep(poll)
+        return True
+
+    def heartbeat(self, job_ids):
+        """
+        Renews the lease on jobs a live worker is still running.
+        """
+        def heartbeat(db):
+            now = time.time()
+            db.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND state = 'running'", [(now, job_id) for job_id in job_ids]
+            )
+
+        self._transaction(heartbeat)
+
+    def stats(self):
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE queue = ? GROUP BY state", (self.name,)
+            ).fetchall()
+        return {"name": self.name, **dict(rows)}
+
+
+class Workers:
+    """
+    Daemon threads that run `handler(payload)` for each job claimed from `queue`.
+    Idle workers sleep until something is enqueued in this process, and poll every
+    `poll` seconds for jobs enqueued by other processes.
+    One more thread renews the lease on every job being run every `heartbeat` seconds
+    (a third of the lease by default), so only jobs whose worker is gone expire.
+    """
+
+    def __init__(self, queue, handler, count, poll=None, heartbeat=None):
+        self.queue = queue
+        self.handler = handler
+        self.count = count
+        self.poll = config.JOB_POLL_INTERVAL if poll is None else poll
+        self.heartbeat = queue.lease / 3 if heartbeat is None else heartbeat
+        self._threads = []
+        self._stop = threading.Event()
+        self._held = set()  # IDs of the jobs being run right now
+        self._held_lock = threading.Lock()
+
+    def start(self):
+        if not self._threads:
+            thread = threading.Thread(target=self._beat, name=f"{self.queue.name}-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for index in range(self.count + 1 - len(self._threads)):
+            thread = threading.Thread(target=self._run, name=f"{self.queue.name}-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.queue.wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                logger.warning("Job queue %s: claim failed: %s", self.queue.name, e)
+                job = None
+            if job is None:
+                self.queue.wakeup.wait(self.poll)
+                self.queue.wakeup.clear()
+                continue
+
+            job_id, key, payload = job
+            new_trace_id(f"{self.queue.name}-job-{job_id}")  # Log lines from the job share one trace ID
+            with self._held_lock:
+                self._held.add(job_id)
+            try:
+                self.handler(payload)
+            except Exception as e:
+                logger.warning("Job %s (%s) failed: %s", job_id, key, e)
+                self.queue.fail(job_id, e)
+            else:
+                self.queue.complete(job_id)
+            finally:
+                with self._held_lock:
+                    self._held.discard(job_id)
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            with self._held_lock:
+                held = list(self._held)
+            if not held:
+                continue
+            try:
+                self.queue.heartbeat(held)
+            except sqlite3.Error as e:
+                logger.warning("Job queue %s: heartbeat failed: %s", self.queue.name, e)
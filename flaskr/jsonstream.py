@@ -0,0 +1,61 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JsonObjectStream:
+    """
+    Incremental extractor for the objects inside a JSON array that arrives in pieces,
+    e.g. the token stream of an LLM answer. Feed it text as it arrives and it returns each
+    array element object as soon as its closing brace is seen.
+    Works on a bare array ([{...}, {...}]) or an array inside a wrapper object
+    ({"questions": [{...}]}); text outside the JSON such as ```json fences is ignored.
+    """
+
+    def __init__(self):
+        self._stack = []  # Open containers: "[" or "{"
+        self._in_string = False
+        self._escaped = False
+        self._capture = None  # Characters of the element object being read
+        self._capture_depth = None
+
+    def feed(self, text):
+        objects = []
+        for char in text:
+            if self._capture is not None:
+                self._capture.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = bool(self._stack)  # Quotes outside any JSON are just prose
+            elif char in "[{":
+                if char == "{" and self._capture is None and self._stack and self._stack[-1] == "[":
+                    self._capture = [char]
+                    self._capture_depth = len(self._stack)
+                self._stack.append(char)
+            elif char in "]}" and self._stack:
+                self._stack.pop()
+                if self._capture is not None and len(self._stack) == self._capture_depth:
+                    raw = "".join(self._capture)
+                    self._capture = None
+                    try:
+                        objects.append(json.loads(raw))
+                    except ValueError as e:
+                        logger.warning("Skipping malformed JSON object: %s", e)
+        return objects
+
+
+def iter_json_objects(text):
+    """
+    Returns every array element object in a complete piece of text.
+    """
+    return JsonObjectStream().feed(text)
@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import openai
+
+from . import config
+from .metrics import registry, upstream
+
+logger = logging.getLogger(__name__)
+
+# How often an async caller re-checks for a free in-flight slot
+_POLL_INTERVAL = 0.05
+
+
+RETRIES = registry.counter("llm_retries_total", "LLM calls retried after a retryable error.", ("reason",))
+WAIT_SECONDS = registry.histogram("llm_wait_seconds", "Time LLM calls waited for an in-flight slot and the rate limiter.")
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to `burst`.
+    reserve() takes a token straight away and returns how long the caller must wait
+    before using it, so sync and async callers can share one bucket.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class _HeldStream:
+    """
+    Wraps a streamed response so its in-flight slot is released exactly once: when the
+    stream ends, fails, is closed, or is garbage-collected without ever being read.
+    The underlying response is closed too, freeing its HTTP connection; an async stream's
+    close() is a coroutine, so for an abandoned one it is scheduled on `loop`, the event
+    loop that opened it.
+    """
+
+    def __init__(self, stream, release, loop=None):
+        self._stream = stream
+        self._iterator = None
+        self._release = release
+        self._released = False
+        self._loop = loop
+
+    def _release_slot(self):
+        if self._released:
+            return False
+        self._released = True
+        self._release()
+        return True
+
+    def close(self):
+        if not self._release_slot():
+            return
+        close = getattr(self._stream, "close", None)
+        if close is None:
+            return
+        if not asyncio.iscoroutinefunction(close):
+            close()  # Frees the HTTP connection of a sync stream abandoned half-way
+        elif self._loop is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(close(), self._loop)
+
+    __del__ = close
+
+    async def aclose(self):
+        if not self._release_slot():
+            return
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+
+def _retryable(error):
+    if isinstance(error, openai.APIConnectionError):  # Includes timeouts
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def _retry_after(error):
+    # Honour the server's hint on 429s when it gives one
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000
+        if "retry-after" in response.headers:
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class LLMGateway:
+    """
+    The one way out to the chat completions API, for both the sync and the async client.
+    Every call waits for one of `max_in_flight` slots and a rate-limiter token, gets a
+    per-call timeout, and is retried with jittered exponential backoff on 429s, 5xxs,
+    timeouts and connection errors. Streamed calls hold their slot until the stream is read
+    (or closed); only opening the stream is retried.
+    """
+
+    def __init__(self, client=None, async_client=None, max_in_flight=None, rate=None, burst=None,
+                 retries=None, timeout=None, backoff_base=None, backoff_max=None):
+        self.client = client
+        self.async_client = async_client
+        self.retries = config.LLM_RETRIES if retries is None else retries
+        self.timeout = config.LLM_TIMEOUT if timeout is None else timeout
+        self.backoff_base = config.LLM_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = config.LLM_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.bucket = TokenBucket(
+            config.LLM_REQUESTS_PER_SECOND if rate is None else rate,
+            config.LLM_BURST if burst is None else burst,
+        )
+        self._slots = threading.BoundedSemaphore(config.LLM_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _backoff(self, attempt, error):
+        hint = _retry_after(error)
+        if hint is not None:
+            return min(hint, self.backoff_max)
+        # "Full jitter": anywhere between 0 and the exponential ceiling
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _should_retry(self, attempt, error):
+        if attempt >= self.retries or not _retryable(error):
+            self._count("failed")
+            return None
+        self._count("retried")
+        RETRIES.inc(reason=getattr(error, "status_code", None) or type(error).__name__)
+        delay = self._backoff(attempt, error)
+        logger.warning("LLM call failed (%s); retry %d/%d in %.1fs", error, attempt + 1, self.retries, delay)
+        return delay
+
+    def create(self, **kwargs):
+        """
+        chat.completions.create on the sync client. With stream=True, returns an iterator
+        over the chunks that releases its slot when exhausted or closed.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        waited = time.perf_counter()
+        self._slots.acquire()
+        try:
+            response = self._create(kwargs, waited)
+        except BaseException:
+            self._slots.release()
+            raise
+        if kwargs.get("stream"):
+            return _HeldStream(response, self._slots.release)
+        self._slots.release()
+        return response
+
+    def _create(self, kwargs, waited):
+        attempt = 0
+        while True:
+            time.sleep(self.bucket.reserve())
+            if attempt == 0:
+                WAIT_SECONDS.observe(time.perf_counter() - waited)
+            self._count("calls")
+            try:
+                # For streams this times the wait for the first bytes, not the whole answer
+                with upstream("openai", "chat_stream" if kwargs.get("stream") else "chat"):
+                    return self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._should_retry(attempt, e)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acreate(self, **kwargs):
+        """
+        Async chat.completions.create on the async client, sharing the same slots and rate limit.
+        With stream=True, returns an async iterator with the same release rules; aclose() it
+        when stopping early.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        waited = time.perf_counter()
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(_POLL_INTERVAL)
+        try:
+            response = await self._acreate(kwargs, waited)
+        except BaseException:
+            self._slots.release()
+            raise
+        if kwargs.get("stream"):
+            return _HeldStream(response, self._slots.release, loop=asyncio.get_running_loop())
+        self._slots.release()
+        return response
+
+    async def _acreate(self, kwargs, waited):
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.bucket.reserve())
+            if attempt == 0:
+                WAIT_SECONDS.observe(time.perf_counter() - waited)
+            self._count("calls")
+            try:
+                with upstream("openai", "chat_stream" if kwargs.get("stream") else "chat"):
+                    return await self.async_client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._should_retry(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "retried": self.retried, "failed": self.failed}
@@ -0,0 +1,251 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+import uuid
+
+# Default latency buckets in seconds: fast cache hits up to slow LLM calls
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+trace_id = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id(incoming=None):
+    """
+    Starts a trace for the current request (reusing a sane incoming X-Request-ID) and returns its ID.
+    Work handed to the shared thread pools carries the ID along (see executor.get_pool).
+    """
+    value = incoming if incoming and len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex[:16]
+    trace_id.set(value)
+    return value
+
+
+def configure_logging(level="INFO"):
+    """
+    Adds the current trace ID to every log record as %(trace_id)s and, unless logging is
+    already configured, logs to stderr with the trace ID in each line.
+    """
+    factory = logging.getLogRecordFactory()
+    if not getattr(factory, "adds_trace_id", False):
+        def record_factory(*args, **kwargs):
+            record = factory(*args, **kwargs)
+            record.trace_id = trace_id.get()
+            return record
+
+        record_factory.adds_trace_id = True
+        logging.setLogRecordFactory(record_factory)
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextlib.contextmanager
+    def track(self, **labels):
+        """
+        Counts the with-block as in progress for its duration.
+        """
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][index] += 1
+                    break
+            counts[1] += value
+            counts[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Observes how long the with-block took, whether or not it raised.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (buckets, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, buckets):
+                    cumulative += bucket
+                    samples.append((self.name + "_bucket", key, (("le", _format_value(bound)),), cumulative))
+                samples.append((self.name + "_sum", key, (), total))
+                samples.append((self.name + "_count", key, (), count))
+        return samples
+
+
+class Collected(_Metric):
+    """
+    A metric read from elsewhere at scrape time: `collect()` returns {label values tuple: value}.
+    Used to expose counters other modules already keep (cache hits, job states).
+    """
+
+    def __init__(self, name, help, type, labels, collect):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        return [(self.name, tuple(str(v) for v in key), (), value) for key, value in sorted(self.collect().items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # Re-importing a module must not duplicate its metrics
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collected(self, name, help, type, labels, collect):
+        return self._register(Collected(name, help, type, labels, collect))
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logging.getLogger(__name__).warning("Metric %s failed to collect: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, key, extra, value in samples:
+                lines.append(f"{name}{_format_labels(metric.labels, key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Metrics shared by several modules
+STAGE_SECONDS = registry.histogram("pipeline_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+STAGE_FAILURES = registry.counter("pipeline_stage_failures_total", "Pipeline stages that failed or timed out.", ("stage", "reason"))
+HTTP_SECONDS = registry.histogram("http_request_seconds", "Time to produce each HTTP response.", ("endpoint", "method", "status"))
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled.", ("endpoint",))
+UPSTREAM_SECONDS = registry.histogram("upstream_request_seconds", "Latency of outbound calls.", ("service", "operation"))
+UPSTREAM_ERRORS = registry.counter("upstream_errors_total", "Outbound calls that raised.", ("service", "operation"))
+UPSTREAM_IN_FLIGHT = registry.gauge("upstream_in_flight", "Outbound calls currently in progress.", ("service",))
+
+
+@contextlib.contextmanager
+def upstream(service, operation):
+    """
+    Times one outbound call, counting it as in flight and counting it as an error if it raises.
+    """
+    with UPSTREAM_IN_FLIGHT.track(service=service):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            UPSTREAM_ERRORS.inc(service=service, operation=operation)
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, service=service, operation=operation)
+
+
+def stage_name(name):
+    """
+    Metric label for a task graph task: ("search", 3) is just "search".
+    """
+    return name[0] if isinstance(name, tuple) else str(name)
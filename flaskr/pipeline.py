@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+
+from . import config
+from .executor import get_pool
+from .metrics import STAGE_FAILURES, STAGE_SECONDS, stage_name
+
+logger = logging.getLogger(__name__)
+
+
+class TaskFailed(Exception):
+    """Raised in place of a result when a task errored, timed out, or lost a dependency."""
+
+
+class _Task:
+    def __init__(self, name, fn, deps, pool, timeout, deadline):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.pool = pool
+        self.timeout = timeout
+        self.deadline = deadline  # time.monotonic() by which the task must have finished, queued or not
+        self.started_at = None  # Set once the task is actually running on a pool thread
+        self.submitted = False
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class TaskGraph:
+    """
+    A tiny dependency graph of pipeline stages.
+    Every task is submitted to its thread pool the moment all of its dependencies have
+    finished, so independent stages overlap and the request costs roughly max(stages).
+    Tasks may add further tasks while the graph is running (e.g. one search per keyword).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._tasks = {}
+        self._finished = []  # Task names in the order they finished
+
+    def add(self, name, fn, deps=(), pool="stage", timeout=None, deadline=None):
+        """
+        Registers `fn` under `name`. It is called with the results of `deps`, in order.
+        `timeout` bounds how long the task may run once it has started; `deadline`, a
+        time.monotonic() value, is when it fails regardless, even if it is still queued.
+        """
+        with self._cond:
+            if name in self._tasks:
+                raise ValueError(f"Task {name!r} already exists")
+            task = _Task(name, fn, deps, pool, timeout, deadline)
+            self._tasks[name] = task
+            self._schedule(task)
+
+    def _schedule(self, task):
+        # Caller holds self._cond
+        if task.submitted or task.done:
+            return
+        deps = [self._tasks.get(dep) for dep in task.deps]
+        if any(dep is None or not dep.done for dep in deps):
+            return
+        failed = [dep.name for dep in deps if dep.error is not None]
+        if failed:
+            self._finish(task, error=TaskFailed(f"dependency {failed[0]!r} failed"))
+            return
+        task.submitted = True
+        args = [dep.result for dep in deps]
+        get_pool(task.pool).submit(self._run, task, args)
+
+    def _run(self, task, args):
+        with self._cond:
+            if task.done:  # Hit its deadline while still queued
+                return
+            task.started_at = time.monotonic()
+        try:
+            result, error = task.fn(*args), None
+        except Exception as e:
+            logger.warning("Task %r failed: %s", task.name, e)
+            STAGE_FAILURES.inc(stage=stage_name(task.name), reason="error")
+            result, error = None, e
+        STAGE_SECONDS.observe(time.monotonic() - task.started_at, stage=stage_name(task.name))
+        with self._cond:
+            if not task.done:  # A timed-out task's late result is dropped
+                self._finish(task, result=result, error=error)
+
+    def _finish(self, task, result=None, error=None):
+        # Caller holds self._cond
+        task.done = True
+        task.result = result
+        task.error = error
+        self._finished.append(task.name)
+        for other in self._tasks.values():
+            if task.name in other.deps:
+                self._schedule(other)
+        self._cond.notify_all()
+
+    def join(self, deadline=None):
+        """
+        Blocks until every task (including ones added while running) has finished,
+        timed out, or the overall `deadline` in seconds has passed.
+        Unfinished tasks are marked failed so get() never hands out partial state.
+        """
+        for _ in self.as_completed(deadline):
+            pass
+
+    def as_completed(self, deadline=None):
+        """
+        Yields task names in the order the tasks finish (successfully or not), including
+        tasks added while running, until all are done or `deadline` seconds have passed.
+        The graph lock is released while the caller handles each name.
+        """
+        deadline = config.PIPELINE_DEADLINE if deadline is None else deadline
+        end = time.monotonic() + deadline
+        yielded = 0
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                for task in list(self._tasks.values()):
+                    if task.done:
+                        continue
+                    if task.deadline is not None and now >= task.deadline:
+                        logger.warning("Task %r missed its deadline", task.name)
+                        STAGE_FAILURES.inc(stage=stage_name(task.name), reason="deadline")
+                        self._finish(task, error=TaskFailed("deadline exceeded"))
+                        continue
+                    if task.started_at is None or task.timeout is None:
+                        continue
+                    if now - task.started_at > task.timeout:
+                        logger.warning("Task %r timed out after %.1fs", task.name, task.timeout)
+                        STAGE_FAILURES.inc(stage=stage_name(task.name), reason="timeout")
+                        self._finish(task, error=TaskFailed(f"timed out after {task.timeout}s"))
+
+                pending = [task for task in self._tasks.values() if not task.done]
+                if pending and now >= end:
+                    logger.warning("Pipeline deadline of %.1fs hit with %d tasks unfinished", deadline, len(pending))
+                    for task in pending:
+                        if not task.done:  # May already have failed through a dependency
+                            STAGE_FAILURES.inc(stage=stage_name(task.name), reason="deadline")
+                            self._finish(task, error=TaskFailed("pipeline deadline exceeded"))
+                    pending = []
+
+                finished = self._finished[yielded:]
+                yielded += len(finished)
+                if not finished:
+                    if not pending:
+                        return
+                    self._cond.wait(timeout=min(0.25, end - now))
+                    continue
+
+            yield from finished
+
+    def get(self, name, default=None):
+        """
+        Returns the result of a finished task, or `default` if it failed or never ran.
+        """
+        with self._cond:
+            task = self._tasks.get(name)
+            if task is None or not task.done or task.error is not None:
+                return default
+            return task.result
+
+    def error(self, name):
+        """
+        Returns the exception a task failed with, or None if it succeeded.
+        """
+        with self._cond:
+            task = self._tasks.get(name)
+            if task is None:
+                return TaskFailed(f"task {name!r} was never added")
+            return task.error
@@ -1,13 +1,156 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, g, request, jsonify
+import click
+import copy
+import hashlib
+import json
+import logging
 import random
-from openai import OpenAI
-import yt_dlp
+import sqlite3
+import threading
+import time
+from openai import AsyncOpenAI, OpenAI
 
-# Initialize OpenAI client
+from . import config, httpclient
+from .cache import TieredCache, normalize_text
+from .condense import condense_transcript
+from .adaptive import PassRateTracker
+from .backends import BACKENDS, YtDlpBackend, get_backend
+from .dedup import SeenVideos, video_id
+from .executor import get_pool, map_ordered
+from .jobqueue import JobQueue, Workers
+from .jsonstream import JsonObjectStream, iter_json_objects
+from .llm import LLMGateway
+from .metrics import HTTP_IN_FLIGHT, HTTP_SECONDS, STAGE_SECONDS, new_trace_id, registry, upstream
+from .pipeline import TaskGraph
+from .schemas import (
+    LESSON_PLAN_TOOL,
+    LESSON_PLAN_TOOL_CHOICE,
+    QUIZ_TOOL,
+    QUIZ_TOOL_CHOICE,
+    lesson_queries,
+    validate_questions,
+)
+from .similarity import NearDuplicateFilter
+from .singleflight import SharedFlight, SingleFlight, StreamFlight
+from .ydl import pool as ydl_pool
+
+# Initialize OpenAI clients; every call goes through the gateway's limits and retries
 OPENAI_API_KEY = "YOUR_OPENAI_API_KEY"
-client = OpenAI(api_key=OPENAI_API_KEY)
+llm = LLMGateway(
+    OpenAI(api_key=OPENAI_API_KEY, max_retries=0),
+    AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0),
+)
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('main', __name__, cli_group=None)  # CLI commands register at the top level
+
+search_cache = TieredCache(
+    "search",
+    ttl=config.SEARCH_CACHE_TTL,
+    stale_ttl=config.SEARCH_CACHE_STALE_TTL,
+    max_memory=config.SEARCH_CACHE_MAX_MEMORY,
+    max_disk=config.SEARCH_CACHE_MAX_DISK,
+)
+
+lesson_plan_cache = TieredCache(
+    "lesson_plan",
+    ttl=config.LESSON_PLAN_CACHE_TTL,
+    max_memory=config.LESSON_PLAN_CACHE_MAX_MEMORY,
+    max_disk=config.LESSON_PLAN_CACHE_MAX_DISK,
+)
+
+# Observed share of raw search results that survive each duration filter
+pass_rates = PassRateTracker()
+
+transcript_cache = TieredCache(
+    "transcript",
+    ttl=config.TRANSCRIPT_CACHE_TTL,
+    max_memory=config.TRANSCRIPT_CACHE_MAX_MEMORY,
+    max_disk=config.TRANSCRIPT_CACHE_MAX_DISK,
+)
+transcript_flight = SingleFlight()
+
+quiz_cache = TieredCache(
+    "quiz",
+    ttl=config.QUIZ_CACHE_TTL,
+    max_memory=config.QUIZ_CACHE_MAX_MEMORY,
+    max_disk=config.QUIZ_CACHE_MAX_DISK,
+)
+
+# Identical concurrent /process and /quiz requests share one (payload, status) computation,
+# optionally across workers too; only successful results are published to other workers
+process_flight = SingleFlight()
+shared_process_flight = SharedFlight("process", ttl=config.COALESCE_RESULT_TTL, accept=lambda result: result[1] == 200)
+quiz_flight = SingleFlight()
+shared_quiz_flight = SharedFlight("quiz", ttl=config.COALESCE_RESULT_TTL, accept=lambda result: result[1] == 200 and isinstance(result[0], list))
+# Identical concurrent /process/stream and /quiz/stream requests share one stream of events
+# (in-process only); /process and /quiz follow a stream already running for their key
+process_stream_flight = StreamFlight()
+quiz_stream_flight = StreamFlight()
+
+# Lesson jobs and their stage checkpoints. With an on-disk cache every read goes to SQLite,
+# so any worker process sees the progress made by the one driving the job.
+lesson_jobs = TieredCache(
+    "lesson_job",
+    ttl=config.LESSON_JOB_TTL,
+    max_memory=0 if config.CACHE_DIR else 1024,
+)
+running_lesson_jobs = set()
+running_lesson_jobs_lock = threading.Lock()
+
+# Quizzes for the first videos of each playlist are generated in the background, before anyone asks
+quiz_jobs = JobQueue("quiz")
+
+# Counters other modules already keep, read at scrape time
+registry.collected(
+    "cache_requests_total", "Cache lookups by result.", "counter", ("cache", "result"),
+    lambda: {
+        (stats["name"], result): stats[result]
+        for stats in (cache.stats() for cache in (search_cache, lesson_plan_cache, transcript_cache, quiz_cache))
+        for result in ("hits", "stale_hits", "misses")
+    },
+)
+registry.collected(
+    "background_jobs", "Background jobs by state.", "gauge", ("queue", "state"),
+    lambda: {(stats["name"], state): count for stats in [quiz_jobs.stats()] for state, count in stats.items() if state != "name"},
+)
+registry.collected(
+    "ydl_instances_total", "YoutubeDL instances built and reused.", "counter", ("event",),
+    lambda: {("created",): ydl_pool.stats()["created"], ("reused",): ydl_pool.stats()["reused"]},
+)
+
+# Bump whenever the lesson-plan prompt changes so cached plans from the old prompt are ignored
+LESSON_PLAN_PROMPT_VERSION = 2
+
+# Bump whenever the quiz prompt changes so cached quizzes from the old prompt are ignored
+QUIZ_PROMPT_VERSION = 4
+
+@bp.before_app_request
+def start_request_trace():
+    g.trace_id = new_trace_id(request.headers.get("X-Request-ID"))
+    g.started_at = time.perf_counter()
+    g.endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_IN_FLIGHT.inc(endpoint=g.endpoint)
+
+@bp.after_app_request
+def finish_request_trace(response):
+    # Streamed responses are timed to their first byte; their stages have their own metrics
+    HTTP_SECONDS.observe(time.perf_counter() - g.started_at, endpoint=g.endpoint, method=request.method, status=response.status_code)
+    response.headers["X-Request-ID"] = g.trace_id
+    return response
 
-bp = Blueprint('main', __name__)
+@bp.teardown_app_request
+def end_request_trace(error=None):
+    if "endpoint" in g:
+        HTTP_IN_FLIGHT.dec(endpoint=g.endpoint)
+
+@bp.route("/metrics")
+def metrics():
+    """
+    Prometheus text exposition of every metric this process keeps.
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
 @bp.route("/")
 def home():
@@ -28,21 +171,98 @@ def process():
     if not random_theme:
         return jsonify({"error": "No random theme provided"}), 400
     
-    # Extract keywords using GPT-4
-    keywords = get_keywords_from_prompt(study_topic)
-    if isinstance(keywords, dict) and "error" in keywords:
-        return jsonify(keywords), 500
-    
-    # Get useful videos from YouTube using the extracted keywords and filter by duration
-    useful_videos = get_youtube_videos_for_keywords(keywords, duration=duration)
-    
-    # Get fun videos using the provided random theme (not checking for Shorts)
-    fun_videos = get_youtube_fun_videos(random_theme)
-    
-    # Interleave fun videos into the useful videos list
-    combined_videos = interleave_fun_videos(useful_videos, fun_videos)
-    
-    return jsonify(combined_videos)
+    key = lesson_request_key(study_topic, duration, random_theme)
+
+    def run():
+        events = process_stream_flight.follow(key)
+        if events is not None:
+            return playlist_from_events(events)  # A /process/stream request is already building this lesson
+        return run_lesson(study_topic, duration, random_theme)
+
+    payload, status, outline = coalesce(process_flight, shared_process_flight, key, run)
+    return jsonify(payload), status
+
+@bp.route("/process/stream", methods=["POST"])
+def process_stream():
+    """
+    Streaming variant of /process. Responds with NDJSON events as soon as each stage finishes:
+      {"type": "plan", "keywords": [...]}                 once the lesson plan is complete
+      {"type": "videos", "index": i, "videos": [...]}     a batch of videos for lesson slot i
+      {"type": "error", "error": "..."} or {"type": "done"} at the end
+    Slot i holds keyword i's study videos; fun videos are dropped into random slots.
+    No video ID appears in more than one event.
+    Clients build the playlist by concatenating the slots in index order.
+    Identical concurrent requests share one pipeline run and receive the same events.
+    """
+    data = request.json
+
+    study_topic = data.get("studyTopic")
+    duration = data.get("duration", "medium")
+    random_theme = data.get("randomTheme")
+
+    if not study_topic:
+        return jsonify({"error": "No study topic provided"}), 400
+    if not random_theme:
+        return jsonify({"error": "No random theme provided"}), 400
+
+    key = lesson_request_key(study_topic, duration, random_theme)
+
+    def event(payload):
+        return json.dumps(payload) + "\n"
+
+    def generate():
+        try:
+            # Checked before joining the stream flight: a stream's driver must never wait on /process,
+            # which may itself be following that stream
+            joined = process_flight.join(key)
+            if joined is not None:
+                events = replay_lesson(*joined)
+            else:
+                events = process_stream_flight.stream(key, lambda: lesson_events(study_topic, duration, random_theme))
+            for payload in events:
+                yield event(payload)
+        except Exception as e:
+            logger.warning("Lesson stream failed: %s", e)
+            yield event({"type": "error", "error": str(e)})
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@bp.route("/lessons", methods=["POST"])
+def submit_lesson():
+    """
+    Job-based /process. Responds at once with {"jobId": ..., "state": ...}; poll GET /lessons/<jobId>.
+    Resubmitting the same lesson returns the same job. A job that failed, finished with some
+    searches missing, or whose worker stopped, resumes from its last finished stage instead
+    of starting over.
+    """
+    data = request.json
+
+    study_topic = data.get("studyTopic")
+    duration = data.get("duration", "medium")
+    random_theme = data.get("randomTheme")
+
+    if not study_topic:
+        return jsonify({"error": "No study topic provided"}), 400
+    if not random_theme:
+        return jsonify({"error": "No random theme provided"}), 400
+
+    job = start_lesson_job(study_topic, duration, random_theme)
+    return jsonify({"jobId": job["id"], "state": job["state"]}), 200 if job["state"] == "done" else 202
+
+@bp.route("/lessons/<job_id>", methods=["GET"])
+def lesson_status(job_id):
+    """
+    Progress and partial results of a lesson job:
+      {"jobId", "state": "running" | "done" | "partial" | "error", "progress": {"done", "total"},
+       "keywords", "videos", "error"}
+    While running, "videos" holds the study videos found so far in lesson order;
+    once done it is the full playlist, exactly as /process would return it.
+    "partial" is a playlist missing the searches that failed; resubmitting retries just those.
+    """
+    job = lesson_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown lesson job"}), 404
+    return jsonify(lesson_job_view(job))
 
 @bp.route("/quiz", methods=["POST"])
 def process_quiz():
@@ -54,92 +274,613 @@ def process_quiz():
     if not youtube_id:
         return jsonify({"error": "No YouTube ID provided"}), 400
     
+    # A prefetch job already writing this quiz, in any worker, leaves it in the quiz cache
+    # (waited for up to JOB_WAIT_TIMEOUT, then generated here); a queued one is not needed any more
+    quiz_jobs.wait(youtube_id)
+    quiz_jobs.cancel(youtube_id)
+
     # Get quiz questions for the provided YouTube video ID
-    subtitles = get_subtitles(youtube_id)
+    quiz, status = coalesce(quiz_flight, shared_quiz_flight, youtube_id, lambda: (build_quiz(youtube_id), 200))
+
+    return jsonify(quiz), status
 
-    quiz = create_quiz(subtitles)
+@bp.route("/quiz/stream", methods=["POST"])
+def process_quiz_stream():
+    """
+    Streaming variant of /quiz. Responds with NDJSON events:
+      {"type": "question", "index": i, "question": {...}}  as soon as each question is complete
+      {"type": "error", "error": "..."} or {"type": "done"} at the end
+    """
+    data = request.json
 
-    return jsonify(quiz)
+    youtube_id = data.get("youtubeId")
+
+    if not youtube_id:
+        return jsonify({"error": "No YouTube ID provided"}), 400
+
+    def event(payload):
+        return json.dumps(payload) + "\n"
+
+    def generate():
+        try:
+            # A prefetch job or /quiz request already writing this quiz is waited for (checked first,
+            # as in /process/stream; prefetch jobs only up to JOB_WAIT_TIMEOUT); otherwise identical streams share one
+            quiz_jobs.wait(youtube_id)
+            joined = quiz_flight.join(youtube_id)
+            if joined is not None:
+                questions, status = joined
+                if isinstance(questions, dict) and "error" in questions:
+                    raise Exception(questions["error"])
+            else:
+                questions = quiz_stream_flight.stream(youtube_id, lambda: stream_video_quiz(youtube_id))
+            for index, question in enumerate(questions):
+                yield event({"type": "question", "index": index, "question": question})
+        except Exception as e:
+            yield event({"type": "error", "error": str(e)})
+            return
+        yield event({"type": "done"})
+
+    return Response(generate(), mimetype="application/x-ndjson")
 
 # Helper functions
-def get_keywords_from_prompt(prompt):
+def coalesce(flight, shared, key, fn):
     """
-    Uses OpenAI's chat completion API with model 'gpt-4' to generate an ordered lesson plan with YouTube-searchable keywords.
-    Ensures that keywords are unique and cover different aspects of the topic.
+    Runs fn once for all identical requests in flight in this process, and, with
+    COALESCE_ACROSS_WORKERS, once across the worker processes on this host.
+    """
+    if config.COALESCE_ACROSS_WORKERS:
+        return flight.do(key, lambda: shared.do(key, fn))
+    return flight.do(key, fn)
+
+def lesson_request_key(study_topic, duration, random_theme):
+    """
+    Requests that differ only in case or spacing are the same lesson.
+    """
+    return (normalize_text(study_topic), duration, normalize_text(random_theme))
+
+def run_lesson(study_topic, duration, random_theme):
+    """
+    The whole /process pipeline. Returns (payload, status, outline); see lesson_outline.
+    """
+    graph = build_lesson_graph(study_topic, duration, random_theme)
+    graph.join()
+
+    if graph.error("keywords") is not None:
+        return {"error": f"Error in GPT-4 call: {str(graph.error('keywords'))}"}, 500, None
+    keywords = graph.get("keywords")
+
+    # Useful videos keep the lesson-plan order; a failed search just contributes nothing
+    slots = merge_keyword_slots(graph.get(("search", index)) for index in range(len(keywords)))
+    useful_videos = [video for videos in slots for video in videos]
+    fun_videos = graph.get("fun_videos", [])
+
+    enqueue_quizzes(useful_videos)
+
+    # Interleave fun videos into the useful videos list
+    with STAGE_SECONDS.time(stage="interleave"):
+        return interleave_fun_videos(useful_videos, fun_videos), 200, lesson_outline(keywords, slots)
+
+def lesson_outline(keywords, slots):
+    """
+    What replay_lesson needs besides the playlist: the lesson plan after near-duplicate
+    collapsing, and how many study videos each keyword's slot holds.
+    """
+    return {"keywords": keywords, "slots": [len(videos) for videos in slots]}
+
+def lesson_events(study_topic, duration, random_theme):
+    """
+    The /process/stream events of one pipeline run, as dicts (see process_stream).
+    """
+    graph = build_lesson_graph(study_topic, duration, random_theme)
+    keywords = None
+    early = []  # Stages that finished before the plan did
+    slots = {}  # Lesson slot -> study videos, for quiz pre-generation
+
+    def videos_events(name):
+        # Searches already deduplicated their results against each other
+        if name == "fun_videos":
+            for video in graph.get(name, []):
+                yield {"type": "videos", "index": random.randint(0, max(len(keywords) - 1, 0)), "videos": [video]}
+            return
+        slots[name[1]] = graph.get(name) or []
+        yield {"type": "videos", "index": name[1], "videos": slots[name[1]]}
+
+    for name in graph.as_completed():
+        if name != "keywords":
+            if keywords is None:
+                early.append(name)
+            else:
+                yield from videos_events(name)
+            continue
+
+        if graph.error("keywords") is not None:
+            yield {"type": "error", "error": f"Error in GPT-4 call: {str(graph.error('keywords'))}"}
+            return
+        keywords = graph.get("keywords")
+        yield {"type": "plan", "keywords": keywords}
+        for early_name in early:
+            yield from videos_events(early_name)
+
+    enqueue_quizzes([video for index in sorted(slots) for video in slots[index]])
+    yield {"type": "done"}
+
+def replay_lesson(payload, status, outline):
+    """
+    /process/stream events for a finished /process result: its plan, then one event per
+    keyword slot. Study videos fill the slots in order, and each fun video stays in the slot
+    it was interleaved into, so the slots concatenate back to the same playlist.
     """
+    if status != 200:
+        return [{"type": "error", "error": payload["error"]}]
+    counts = outline["slots"]
+    slots = [[] for _ in counts] or [[]]
+    index, left = 0, counts[0] if counts else 0
+    for video in payload:
+        if not video.get("is_fun"):
+            while left == 0 and index < len(slots) - 1:
+                index += 1
+                left = counts[index]
+            left -= 1
+        slots[index].append(video)
+    return (
+        [{"type": "plan", "keywords": outline["keywords"]}]
+        + [{"type": "videos", "index": index, "videos": videos} for index, videos in enumerate(slots)]
+        + [{"type": "done"}]
+    )
+
+def playlist_from_events(events):
+    """
+    The /process result of a /process/stream run: its slots concatenated in index order,
+    as a client would build it. Returns (payload, status, outline).
+    """
+    keywords = []
+    slots = {}
+    try:
+        for payload in events:
+            if payload["type"] == "error":
+                return {"error": payload["error"]}, 500, None
+            if payload["type"] == "plan":
+                keywords = payload["keywords"]
+            if payload["type"] == "videos":
+                slots.setdefault(payload["index"], []).extend(payload["videos"])
+    except Exception as e:
+        return {"error": str(e)}, 500, None
+    outline = {
+        "keywords": keywords,
+        "slots": [sum(not video.get("is_fun") for video in slots.get(index, [])) for index in range(len(keywords))],
+    }
+    return [video for index in sorted(slots) for video in slots[index]], 200, outline
+
+def lesson_job_id(study_topic, duration, random_theme):
+    """
+    Jobs are named after the normalized request, so a retried or reloaded request finds its job.
+    """
+    key = json.dumps(lesson_request_key(study_topic, duration, random_theme))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def start_lesson_job(study_topic, duration, random_theme):
+    """
+    Returns the job record for a lesson, (re)starting it on the job pool unless it is
+    done or still making progress somewhere. Failed and partial jobs resume.
+    """
+    job_id = lesson_job_id(study_topic, duration, random_theme)
+    with running_lesson_jobs_lock:
+        job = lesson_jobs.get(job_id)
+        if job is not None:
+            if job["state"] == "done" or job_id in running_lesson_jobs:
+                return job
+            if job["state"] == "running" and time.time() - job["updated_at"] < config.LESSON_JOB_STALE:
+                return job  # Being driven by another worker process
+            logger.info("Resuming lesson job %s from its checkpoints", job_id)
+        else:
+            job = {
+                "id": job_id,
+                "request": {"studyTopic": study_topic, "duration": duration, "randomTheme": random_theme},
+                "keywords": None,
+                "searches": {},
+                "fun_videos": None,
+                "videos": None,
+            }
+        job.update(state="running", error=None, videos=None, updated_at=time.time())
+        save_lesson_job(job)
+        running_lesson_jobs.add(job_id)
+
+    get_pool("job").submit(run_lesson_job, job)
+    return job
+
+def run_lesson_job(job):
+    """
+    Drives one lesson job's task graph, checkpointing every stage as it finishes.
+    """
+    request_data = job["request"]
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{
-                "role": "user",
-                "content": f"""
-                Create an **ordered lesson plan** with different keywords that can be searched on YouTube to generate a complete video series lesson plan for the given topic. 
-
-                - **Ensure that each keyword is unique and distinct.**
-                - **Do not include repetitive or nearly identical search terms.**
-                - **Each keyword should focus on a different concept, application, or technical detail.**
-                - **Ensure that the keywords are commonly searched on YouTube and yield different video results.**
-                
-                **Return the lesson plan as an ordered list in a single string, with each lesson separated by commas.**
-                
-                ### **Example Format** (for "Machine Learning"):  
-                1. Introduction to Machine Learning,  
-                2. History and Evolution of Machine Learning,  
-                3. Supervised vs. Unsupervised Learning: Key Differences,  
-                4. Common Machine Learning Algorithms Explained,  
-                5. Feature Engineering and Data Preprocessing,  
-                6. Understanding Bias and Variance in Machine Learning,  
-                7. Real-World Applications of Machine Learning,  
-                8. Explainability and Interpretability in AI,  
-                9. Hands-on Machine Learning Project Tutorial,  
-                10. Ethical Considerations in Machine Learning.  
-
-                Now generate a lesson plan for this topic: **{prompt}**
-                """
-            }],
-            max_tokens=300,
+        graph = build_lesson_graph(request_data["studyTopic"], request_data["duration"], request_data["randomTheme"], checkpoint=job)
+        for name in graph.as_completed():
+            if graph.error(name) is not None:
+                if name == "keywords":
+                    raise graph.error(name)
+                continue  # Left out of the checkpoint, so a resubmitted job retries it
+            if name == "keywords":
+                job["keywords"] = graph.get(name)
+            elif name == "fun_videos":
+                job["fun_videos"] = graph.get(name)
+            else:
+                job["searches"][str(name[1])] = graph.get(name)
+            save_lesson_job(job)
+
+        useful_videos = merge_keyword_videos(job["searches"].get(str(index)) for index in range(len(job["keywords"])))
+        enqueue_quizzes(useful_videos)
+        missing = len(job["keywords"]) - len(job["searches"]) + (job["fun_videos"] is None)
+        job.update(
+            state="partial" if missing else "done",
+            error=f"{missing} searches failed; resubmit the lesson to retry them" if missing else None,
+            videos=interleave_fun_videos(useful_videos, job["fun_videos"] or []),
         )
     except Exception as e:
-        return {"error": f"Error in GPT-4 call: {str(e)}"}
+        logger.warning("Lesson job %s failed: %s", job["id"], e)
+        job.update(state="error", error=f"Error in GPT-4 call: {str(e)}")
+    finally:
+        save_lesson_job(job)
+        with running_lesson_jobs_lock:
+            running_lesson_jobs.discard(job["id"])
 
-    result = response.choices[0].message.content.strip()
-    keywords = list(dict.fromkeys([keyword.strip() for keyword in result.split(",") if keyword.strip()]))  # Remove duplicates
-    return keywords
+def save_lesson_job(job):
+    # A snapshot, so readers never see the driver's dict change under them
+    job["updated_at"] = time.time()
+    lesson_jobs.set(job["id"], copy.deepcopy(job))
+
+def lesson_job_view(job):
+    """
+    The client-facing shape of a job record.
+    """
+    keywords = job["keywords"]
+    total = None if keywords is None else len(keywords) + 2  # Plan, fun search, one search per keyword
+    finished = (keywords is not None) + (job["fun_videos"] is not None) + len(job["searches"])
+    videos = job["videos"]
+    if videos is None and keywords is not None:
+        videos = merge_keyword_videos(job["searches"].get(str(index)) for index in range(len(keywords)))
+    return {
+        "jobId": job["id"],
+        "state": job["state"],
+        "progress": {"done": finished, "total": total},
+        "keywords": keywords,
+        "videos": videos or [],
+        "error": job["error"],
+    }
+
+def build_quiz(youtube_id):
+    """
+    Transcript, then the cached or newly generated quiz, each timed as its own stage.
+    A /quiz/stream run already writing this quiz is followed instead of asking GPT again.
+    """
+    questions = quiz_stream_flight.follow(youtube_id)
+    if questions is not None:
+        return list(questions)
+    with STAGE_SECONDS.time(stage="transcript"):
+        transcript = get_transcript(youtube_id)
+    with STAGE_SECONDS.time(stage="quiz"):
+        return get_quiz(youtube_id, transcript)
+
+def enqueue_quizzes(videos):
+    """
+    Queues background quiz generation for the first QUIZ_PREFETCH_COUNT study videos,
+    earlier videos first, so a quiz is usually ready by the time its video has been watched.
+    Prefetching is best-effort: a queue error (such as a locked database) is logged, never raised.
+    """
+    study_videos = [video for video in videos if not video.get("is_fun")]
+    try:
+        for position, video in enumerate(study_videos[:config.QUIZ_PREFETCH_COUNT]):
+            youtube_id = video_id(video)
+            if youtube_id:
+                quiz_jobs.enqueue(youtube_id, {"youtubeId": youtube_id}, priority=-position)
+    except sqlite3.Error as e:
+        logger.warning("Could not queue quiz prefetch jobs: %s", e)
+
+def prefetch_quiz(payload):
+    """
+    Job handler: builds and caches one video's quiz, sharing the work with any /quiz request
+    for the same video that arrives meanwhile.
+    """
+    youtube_id = payload["youtubeId"]
+    quiz, status = coalesce(quiz_flight, shared_quiz_flight, youtube_id, lambda: (build_quiz(youtube_id), 200))
+    if isinstance(quiz, dict) and "error" in quiz:
+        raise Exception(quiz["error"])
+
+quiz_workers = Workers(quiz_jobs, prefetch_quiz, config.QUIZ_PREFETCH_WORKERS)
+
+def start_quiz_workers():
+    if config.QUIZ_PREFETCH_COUNT > 0:
+        quiz_workers.start()
+
+def build_lesson_graph(study_topic, duration, random_theme, checkpoint=None):
+    """
+    Starts the /process pipeline as a task graph: the fun search and the GPT lesson plan
+    start at once, and each keyword's search starts as soon as that keyword has been parsed.
+    Tasks: "fun_videos", "keywords" and ("search", i) for the i-th keyword.
+    All searches share one SeenVideos set, so no video appears twice in the playlist.
+    Keyword searches must finish within SEARCH_DEADLINE of the first one starting.
+    Stages already recorded in `checkpoint` (a lesson job record) return their saved
+    results instead of running again.
+    """
+    checkpoint = checkpoint or {}
+    saved_searches = checkpoint.get("searches", {})
+    graph = TaskGraph()
+    seen = SeenVideos()
+    for videos in [checkpoint.get("fun_videos") or []] + list(saved_searches.values()):
+        seen.claim(videos)  # Fresh searches must not repeat videos that are already placed
+
+    if checkpoint.get("fun_videos") is not None:
+        graph.add("fun_videos", lambda: checkpoint["fun_videos"])
+    else:
+        graph.add("fun_videos", lambda: seen.claim(get_youtube_fun_videos(random_theme)), pool="search", timeout=config.SEARCH_TIMEOUT)
+
+    fanout = {}  # "deadline" of the keyword searches, set when the first one is added
+
+    def add_search(index, keyword):
+        if str(index) in saved_searches:
+            graph.add(("search", index), lambda: saved_searches[str(index)])
+            return
+        fanout.setdefault("deadline", time.monotonic() + config.SEARCH_DEADLINE)
+        graph.add(
+            ("search", index),
+            lambda: search_study_videos(keyword, seen, duration=duration),
+            pool="search",
+            timeout=config.SEARCH_TIMEOUT,
+            deadline=fanout["deadline"],
+        )
+
+    def plan_lesson():
+        if checkpoint.get("keywords") is not None:
+            for index, keyword in enumerate(checkpoint["keywords"]):
+                add_search(index, keyword)
+            return checkpoint["keywords"]
+
+        keywords = []
+        unique = NearDuplicateFilter(study_topic)
+        for keyword in stream_keywords_from_prompt(study_topic):
+            # **Near-identical queries would only repeat a multi-second search**
+            if not unique.admit(keyword):
+                logger.info("Collapsed near-duplicate keyword %r", keyword)
+                continue
+            add_search(len(keywords), keyword)
+            keywords.append(keyword)
+        return keywords
+
+    graph.add("keywords", plan_lesson)
+    return graph
+
+def lesson_plan_messages(prompt):
+    """
+    Builds the chat messages asking GPT-4 for an ordered lesson plan through the submit_lesson_plan function.
+    """
+    return [{
+        "role": "user",
+        "content": f"""
+        Create an **ordered lesson plan** with different keywords that can be searched on YouTube to generate a complete video series lesson plan for the given topic. 
+
+        - **Ensure that each keyword is unique and distinct.**
+        - **Do not include repetitive or nearly identical search terms.**
+        - **Each keyword should focus on a different concept, application, or technical detail.**
+        - **Ensure that the keywords are commonly searched on YouTube and yield different video results.**
+
+        **Submit the lesson plan with the submit_lesson_plan function: one step per lesson, in order, each with a plain YouTube search query (no numbering) and the concept it covers.**
+
+        ### **Example Queries** (for "Machine Learning"):  
+        Introduction to Machine Learning  
+        History and Evolution of Machine Learning  
+        Supervised vs. Unsupervised Learning: Key Differences  
+        Common Machine Learning Algorithms Explained  
+        Feature Engineering and Data Preprocessing  
+        Understanding Bias and Variance in Machine Learning  
+        Real-World Applications of Machine Learning  
+        Explainability and Interpretability in AI  
+        Hands-on Machine Learning Project Tutorial  
+        Ethical Considerations in Machine Learning  
+
+        Now generate a lesson plan for this topic: **{prompt}**
+        """
+    }]
+
+def lesson_plan_key(prompt):
+    """
+    Cache key for a lesson plan: the normalized topic, the model that wrote it and the prompt version.
+    """
+    return (normalize_text(prompt), config.LESSON_PLAN_MODEL, LESSON_PLAN_PROMPT_VERSION)
+
+def plan_lesson(prompt):
+    """
+    Makes the uncached GPT-4 lesson-plan call and returns the clean, deduplicated queries in order.
+    Errors are raised.
+    """
+    response = llm.create(
+        model=config.LESSON_PLAN_MODEL,
+        messages=lesson_plan_messages(prompt),
+        tools=[LESSON_PLAN_TOOL],
+        tool_choice=LESSON_PLAN_TOOL_CHOICE,
+        max_tokens=config.LESSON_PLAN_MAX_TOKENS,
+    )
+
+    return lesson_queries(iter_json_objects(message_text(response.choices[0].message)), set())
+
+def stream_keywords_from_prompt(prompt):
+    """
+    Uses OpenAI's chat completion API with model 'gpt-4' to generate an ordered lesson plan with YouTube-searchable keywords.
+    Yields each clean, unique query as soon as its lesson step is complete, so searches can
+    start while GPT-4 is still writing the rest of the plan. Errors from the API call are raised.
+    A cached plan is replayed straight away; a fully streamed plan is added to the cache.
+    """
+    key = lesson_plan_key(prompt)
+    cached = lesson_plan_cache.get(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    stream = llm.create(
+        model=config.LESSON_PLAN_MODEL,
+        messages=lesson_plan_messages(prompt),
+        tools=[LESSON_PLAN_TOOL],
+        tool_choice=LESSON_PLAN_TOOL_CHOICE,
+        max_tokens=config.LESSON_PLAN_MAX_TOKENS,
+        stream=True,
+    )
+
+    parser = JsonObjectStream()
+    seen = set()
+    keywords = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        for keyword in lesson_queries(parser.feed(delta_text(chunk.choices[0].delta)), seen):
+            keywords.append(keyword)
+            yield keyword
+
+    lesson_plan_cache.set(key, keywords)
+
+@bp.cli.command("warm-plans")
+@click.argument("topics", nargs=-1)
+@click.option("--file", "topics_file", type=click.File("r"), help="Read topics from a file, one per line.")
+@click.option("--force", is_flag=True, help="Re-plan topics that are already cached.")
+def warm_plans_command(topics, topics_file, force):
+    """
+    Pre-populates the lesson-plan cache for a list of topics.
+    """
+    topics = list(topics)
+    if topics_file is not None:
+        topics.extend(line.strip() for line in topics_file if line.strip())
+    topics = list(dict.fromkeys(topics))
+
+    if not force:
+        topics = [topic for topic in topics if lesson_plan_cache.get(lesson_plan_key(topic)) is None]
+
+    def warm(topic):
+        keywords = plan_lesson(topic)
+        lesson_plan_cache.set(lesson_plan_key(topic), keywords)
+        return keywords
+
+    results = map_ordered(
+        warm, topics, timeout=config.LLM_TIMEOUT, deadline=config.LLM_TIMEOUT * len(topics), pool="stage", label="Lesson plan"
+    )
+    for topic, keywords in zip(topics, results):
+        if keywords is None:
+            click.echo(f"FAILED  {topic}")
+        else:
+            click.echo(f"ok      {topic} ({len(keywords)} keywords)")
+    click.echo(f"Warmed {sum(result is not None for result in results)} of {len(topics)} topics.")
+
+@bp.cli.command("bench-search")
+@click.argument("queries", nargs=-1, required=True)
+@click.option("--count", default=10, show_default=True, help="Results to request per search.")
+@click.option("--repeat", default=3, show_default=True, help="Searches per query and backend.")
+@click.option("--backend", "backends", multiple=True, type=click.Choice(sorted(BACKENDS)), help="Backends to compare (default: all).")
+def bench_search_command(queries, count, repeat, backends):
+    """
+    Times each search backend on the same queries, bypassing the search cache.
+    """
+    for name in backends or sorted(BACKENDS):
+        backend = get_backend(name)
+        timings, results, failures = [], [], 0
+        for query in queries:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                try:
+                    results.append(len(backend.search(query, count)))
+                except Exception as e:
+                    failures += 1
+                    logger.warning("%s search for %r failed: %s", name, query, e)
+                    continue
+                timings.append(time.perf_counter() - start)
+
+        if not timings:
+            click.echo(f"{name:<16} all {failures} searches failed")
+            continue
+        timings.sort()
+        click.echo(
+            f"{name:<16} mean {sum(timings) / len(timings) * 1000:7.0f} ms   "
+            f"p50 {timings[len(timings) // 2] * 1000:7.0f} ms   "
+            f"max {timings[-1] * 1000:7.0f} ms   "
+            f"avg results {sum(results) / len(results):4.1f}   failures {failures}"
+        )
 
 def search_youtube_videos(query, max_results=5, duration_filter=None, is_fun=False):
     """
-    Uses yt_dlp to search for YouTube videos based on the query.
+    Cached front for fetch_youtube_videos.
+    Results are keyed by the normalized query and the search options, so popular lessons
+    skip yt_dlp entirely and stale entries are refreshed in the background.
+    """
+    key = (normalize_text(query), max_results, duration_filter, is_fun)
+    return search_cache.get_or_compute(
+        key, lambda: fetch_youtube_videos(query, max_results=max_results, duration_filter=duration_filter, is_fun=is_fun)
+    )
+
+def fetch_youtube_videos(query, max_results=5, duration_filter=None, is_fun=False):
+    """
+    Searches the configured backend (SEARCH_BACKEND) for YouTube videos based on the query.
     Filters based on duration and ensures that fun videos are marked correctly.
     Includes channel name in response.
+    With a duration filter, over-fetches by the filter's observed pass rate and searches
+    deeper only while the keyword is still short of `max_results` videos.
     """
-    ydl_opts = {
-        "quiet": True,
-        "extract_flat": True,  # Extract metadata without downloading
-        "force_generic_extractor": True,
-        "default_search": "ytsearch",
-        "max_downloads": max_results,
-    }
+    if is_fun or not duration_filter or not config.SEARCH_ADAPTIVE:
+        return filter_entries(search_entries(query, max_results), duration_filter, is_fun)[:max_results]
+
+    count = pass_rates.fetch_count(duration_filter, max_results)
+    checked = 0  # Raw entries already counted towards the pass rate
+    while True:
+        entries = search_entries(query, count)
+        videos = filter_entries(entries, duration_filter, is_fun)
+        pass_rates.record(duration_filter, len(filter_entries(entries[checked:], duration_filter, is_fun)), len(entries) - checked)
+        checked = len(entries)
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        search_results = ydl.extract_info(f"ytsearch{max_results}:{query}", download=False)
+        exhausted = len(entries) < count  # YouTube had nothing more for this query
+        if len(videos) >= max_results or exhausted or count >= config.SEARCH_MAX_FETCH:
+            return videos[:max_results]
+        count = pass_rates.fetch_count(duration_filter, max_results, have=len(videos), fetched=checked)
+
+def warm_ydl_pool():
+    """
+    Builds YDL_WARM search instances on the stage pool so the first searches after startup
+    do not pay for loading yt_dlp's extractors.
+    """
+    if config.YDL_WARM > 0 and config.SEARCH_BACKEND == YtDlpBackend.name:
+        get_pool("stage").submit(ydl_pool.warm, YtDlpBackend.OPTIONS, config.YDL_WARM)
+
+def search_entries(query, count):
+    """
+    Raw search on the configured backend: the first `count` result entries for the query.
+    """
+    backend = get_backend()
+    with upstream("youtube", f"search_{backend.name}"):
+        return backend.search(query, count)
+
+def passes_duration(duration, duration_filter):
+    """
+    Whether a video of `duration` seconds fits the short/medium/long window.
+    """
+    if duration_filter == "short" and duration >= 240:  # Less than 4 minutes
+        return False
+    if duration_filter == "medium" and (duration < 240 or duration > 1200):  # 4-20 minutes
+        return False
+    if duration_filter == "long" and duration <= 1200:  # More than 20 minutes
+        return False
+    return True
 
+def filter_entries(entries, duration_filter=None, is_fun=False):
+    """
+    Turns raw search entries into video dicts, dropping duplicates and, for study videos,
+    anything outside the duration window.
+    """
     videos = []
     seen_titles = set()  # To store unique video titles and prevent duplicates
 
-    for entry in search_results.get("entries", []):
+    for entry in entries:
         video_title = entry.get("title")
         video_url = entry.get("url")
         video_channel = entry.get("channel", "Unknown Channel")  # Fetch channel name
-        duration = entry.get("duration", 0)  # Duration in seconds
+        duration = entry.get("duration") or 0  # Duration in seconds (None for live streams)
 
         # **Filter by duration for study videos**
-        if not is_fun:  
-            if duration_filter == "short" and duration >= 240:  # Less than 4 minutes
-                continue
-            if duration_filter == "medium" and (duration < 240 or duration > 1200):  # 4-20 minutes
-                continue
-            if duration_filter == "long" and duration <= 1200:  # More than 20 minutes
-                continue
+        if not is_fun and not passes_duration(duration, duration_filter):
+            continue
 
         # **Avoid duplicate titles**
         if video_title in seen_titles:
@@ -147,6 +888,7 @@ def search_youtube_videos(query, max_results=5, duration_filter=None, is_fun=Fal
 
         seen_titles.add(video_title)
         videos.append({
+            "id": entry.get("id") or video_id(video_url),
             "title": video_title,
             "url": video_url,
             "channel": video_channel,  # Include channel name
@@ -162,15 +904,32 @@ def get_youtube_fun_videos(fun_topic, max_results=3):
     """
     return search_youtube_videos(fun_topic, max_results=max_results, is_fun=True)
 
-def get_youtube_videos_for_keywords(keywords, max_results=5, duration="medium"):
+def search_study_videos(keyword, seen, max_results=5, duration="medium"):
     """
-    Uses yt_dlp to search for educational videos on YouTube for each keyword, filtered by duration.
-    Always sets is_fun=False.
+    Searches one lesson keyword and keeps only videos no other search in this request has claimed.
+    If every result was already taken, a deeper search pulls in extra candidates once.
     """
-    videos = []
-    for keyword in keywords:
-        videos.extend(search_youtube_videos(keyword, max_results=max_results, duration_filter=duration, is_fun=False))
-    return videos
+    videos = search_youtube_videos(keyword, max_results=max_results, duration_filter=duration, is_fun=False)
+    fresh = seen.claim(videos)
+    if videos and not fresh:
+        logger.info("All results for %r were duplicates; fetching more candidates", keyword)
+        extra = search_youtube_videos(keyword, max_results=max_results * 2, duration_filter=duration, is_fun=False)
+        fresh = seen.claim(extra, limit=max_results)
+    return fresh
+
+def merge_keyword_videos(results):
+    """
+    Flattens per-keyword search results (in lesson-plan order) into one list.
+    The same video can come up for more than one keyword, so later copies are dropped.
+    """
+    return [video for videos in merge_keyword_slots(results) for video in videos]
+
+def merge_keyword_slots(results):
+    """
+    merge_keyword_videos, keeping one list per keyword.
+    """
+    seen = SeenVideos()
+    return [seen.claim(keyword_videos or []) for keyword_videos in results]  # None means the search failed or timed out
 
 def interleave_fun_videos(useful_videos, fun_videos):
     """
@@ -184,43 +943,205 @@ def interleave_fun_videos(useful_videos, fun_videos):
 
 def get_subtitles(youtube_id, lang='en'):
     """
-    Extracts subtitles from a YouTube video using yt_dlp.
+    Returns the subtitles for a YouTube video, downloading them only on a cache miss.
+    Concurrent requests for the same video share one download.
     """
-    video_url = f"https://www.youtube.com/watch?v={youtube_id}"
+    return get_transcript(youtube_id, lang)["text"]
+
+def get_transcript(youtube_id, lang='en'):
+    """
+    Looks up the transcript store entry for (youtube_id, lang): {"text", "sha256"}.
+    The hash identifies the exact caption content, so downstream caches can key on it.
+    """
+    key = (youtube_id, lang)
+
+    def download():
+        text = download_subtitles(youtube_id, lang)
+        return {"text": text, "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+
+    return transcript_flight.do(key, lambda: transcript_cache.get_or_compute(key, download))
 
+def download_subtitles(youtube_id, lang='en'):
+    """
+    Extracts subtitles from a YouTube video using a pooled yt_dlp instance.
+    yt_dlp picks the caption track; the VTT is then fetched on the shared HTTP client
+    instead of being written to disk, so nothing is shared between concurrent requests.
+    """
+    video_url = f"https://www.youtube.com/watch?v={youtube_id}"
     ydl_opts = {
+        'quiet': True,
         'writeautomaticsub': True,  # Download auto-generated subtitles
         'subtitleslangs': [lang],   # Language of the subtitles
+        'subtitlesformat': 'vtt',
         'skip_download': True,      # Skip the video download, we only need the subtitles
-        'outtmpl': 'subs.txt'       # Template for naming the output file
     }
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([video_url])
-    
-    with open('subs.txt.en.vtt', 'r') as file:
-        subtitles = file.read()
-    
+    with ydl_pool.checkout(ydl_opts) as ydl, upstream("youtube", "video_info"):
+        info = ydl.extract_info(video_url, download=False)
+        track = (info.get('requested_subtitles') or {}).get(lang)
+        if not track or track.get('ext') != 'vtt':
+            raise Exception(f"No {lang} subtitles found for {youtube_id}.")
+        subtitles = track.get('data')
+
+    if subtitles is None:
+        with upstream("youtube", "subtitles"):
+            subtitles = httpclient.get(track['url']).text
     return subtitles
 
+def quiz_cache_key(youtube_id, transcript):
+    """
+    Cache key for a quiz: the video, the exact transcript it was written from, the model and the prompt version.
+    """
+    return (youtube_id, transcript["sha256"], config.QUIZ_MODEL, QUIZ_PROMPT_VERSION)
+
+def get_quiz(youtube_id, transcript):
+    """
+    Returns the quiz for a video, generating it only when no cached quiz exists for this
+    exact transcript, model and prompt version. Failed generations are not cached.
+    """
+    key = quiz_cache_key(youtube_id, transcript)
+    quiz = quiz_cache.get(key)
+    if quiz is not None:
+        return quiz
+
+    quiz = create_quiz(transcript["text"])
+    if not (isinstance(quiz, dict) and "error" in quiz):
+        quiz_cache.set(key, quiz)
+    return quiz
+
+def stream_video_quiz(youtube_id):
+    """
+    stream_quiz for a video, fetching its transcript first. Generated here instead of by a
+    queued prefetch job, so that job is cancelled.
+    """
+    quiz_jobs.cancel(youtube_id)
+    transcript = get_transcript(youtube_id)
+    yield from stream_quiz(youtube_id, transcript)
+
+def stream_quiz(youtube_id, transcript):
+    """
+    Yields validated quiz questions one at a time while GPT-4 is still writing the rest,
+    up to QUIZ_QUESTION_COUNT. Questions that fail validation are replaced by repair_questions
+    once the stream ends; if that fails, the questions already streamed are the quiz.
+    A cached quiz is replayed straight away; a complete quiz is added to the cache.
+    Errors from the API call are raised.
+    """
+    key = quiz_cache_key(youtube_id, transcript)
+    quiz = quiz_cache.get(key)
+    if quiz is not None:
+        yield from quiz
+        return
+
+    stream = llm.create(
+        model=config.QUIZ_MODEL,
+        messages=quiz_messages(transcript["text"]),
+        tools=[QUIZ_TOOL],
+        tool_choice=QUIZ_TOOL_CHOICE,
+        max_tokens=config.QUIZ_MAX_TOKENS,
+        stream=True,
+    )
+
+    parser = JsonObjectStream()
+    questions = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        for question in validate_questions(parser.feed(delta_text(chunk.choices[0].delta))):
+            if len(questions) < config.QUIZ_QUESTION_COUNT:
+                questions.append(question)
+                yield question
+
+    for question in repair_questions(transcript["text"], questions):
+        questions.append(question)
+        yield question
+
+    if questions:
+        quiz_cache.set(key, questions)
+
+def delta_text(delta):
+    """
+    Text carried by a streamed chunk, whether it arrives as content or as function-call arguments.
+    """
+    if delta.tool_calls:
+        return "".join(call.function.arguments or "" for call in delta.tool_calls if call.function)
+    return delta.content or ""
+
+def message_text(message):
+    """
+    Text of a complete response message, preferring the submit_quiz function-call arguments.
+    """
+    if message.tool_calls:
+        return "".join(call.function.arguments or "" for call in message.tool_calls)
+    return message.content or ""
+
+def quiz_messages(subtitles, count=None, avoid=()):
+    """
+    Builds the chat messages asking for `count` MCQs through the submit_quiz function.
+    The transcript is condensed to a fixed token budget sampled across the whole video.
+    `avoid` lists questions already written, so repair rounds don't repeat them.
+    """
+    count = config.QUIZ_QUESTION_COUNT if count is None else count
+    condensed = condense_transcript(subtitles)
+    logger.info("Quiz transcript condensed from ~%d to ~%d tokens", condensed.source_tokens, condensed.tokens)
+    truncated_subtitles = condensed.text
+
+    content = f"""Write {count} multiple-choice questions based on this YouTube transcript.
+Each question needs exactly four options labelled "A. ", "B. ", "C. " and "D. ", and the letter of the correct option as the answer.
+Submit them with the submit_quiz function.
+
+Transcript: {truncated_subtitles}"""
+    if avoid:
+        content += "\n\nDo not repeat these questions:\n" + "\n".join(f"- {question}" for question in avoid)
+
+    return [{"role": "user", "content": content}]
+
 def create_quiz(subtitles):
     """
     Uses OpenAI's chat completion API with model 'gpt-4' to generate quiz questions based on the subtitles.
-    Truncates the subtitles to avoid exceeding the token limit.
+    Returns up to QUIZ_QUESTION_COUNT validated questions; only the questions that failed
+    validation are regenerated, and a failed repair keeps the valid ones.
     """
-    # Truncate subtitles to the first 2000 characters to avoid exceeding the token limit
-    truncated_subtitles = subtitles[:2000]
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{
-                "role": "user",
-                "content": f"""make 8 mcq questions based on this youtube transcript and return it as a json file: {truncated_subtitles}. keep the structure like [{{'question', 'answer'}}]"""
-            }],
-            max_tokens=300,
+        response = llm.create(
+            model=config.QUIZ_MODEL,
+            messages=quiz_messages(subtitles),
+            tools=[QUIZ_TOOL],
+            tool_choice=QUIZ_TOOL_CHOICE,
+            max_tokens=config.QUIZ_MAX_TOKENS,
         )
-        result = response.choices[0].message.content.strip()
-        return result
+        questions = validate_questions(iter_json_objects(message_text(response.choices[0].message)))
     except Exception as e:
-        return {"error": f"Error in GPT-4 call: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error in GPT-4 call: {str(e)}"}
+
+    questions = questions[:config.QUIZ_QUESTION_COUNT]
+    questions += repair_questions(subtitles, questions)
+
+    if not questions:
+        return {"error": "GPT-4 did not return any valid quiz questions"}
+    return questions
+
+def repair_questions(subtitles, questions):
+    """
+    Asks for just enough new questions to replace the ones that were missing or invalid,
+    for up to QUIZ_REPAIR_ATTEMPTS rounds. Returns only the new questions.
+    Repairs are best-effort: a failed call is logged and ends the repair, never raised.
+    """
+    repaired = []
+    for _ in range(config.QUIZ_REPAIR_ATTEMPTS):
+        missing = config.QUIZ_QUESTION_COUNT - len(questions) - len(repaired)
+        if missing <= 0:
+            break
+        logger.info("Repairing %d quiz questions", missing)
+        try:
+            response = llm.create(
+                model=config.QUIZ_MODEL,
+                messages=quiz_messages(subtitles, count=missing, avoid=[q["question"] for q in questions + repaired]),
+                tools=[QUIZ_TOOL],
+                tool_choice=QUIZ_TOOL_CHOICE,
+                max_tokens=config.QUIZ_MAX_TOKENS,
+            )
+            repaired += validate_questions(iter_json_objects(message_text(response.choices[0].message)))[:missing]
+        except Exception as e:
+            logger.warning("Quiz repair failed; keeping %d valid questions: %s", len(questions) + len(repaired), e)
+            break
+    return repaired
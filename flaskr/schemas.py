@@ -0,0 +1,179 @@
+import logging
+import re
+from typing import List
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+logger = logging.getLogger(__name__)
+
+OPTION_LETTERS = "ABCD"
+_OPTION_LABEL = re.compile(r"^\(?[A-Da-d][.):]\s*")
+
+
+class QuizQuestion(BaseModel):
+    """
+    One multiple-choice question in the shape Quiz.jsx renders:
+    four options labelled "A. " to "D. " and the letter of the correct one.
+    Near-misses from the model (unlabelled options, "B)" or the option text as the answer)
+    are normalised instead of rejected.
+    """
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    question: str = Field(min_length=1)
+    options: List[str] = Field(min_length=4, max_length=4)
+    answer: str
+
+    @field_validator("options")
+    @classmethod
+    def label_options(cls, options):
+        labelled = []
+        for letter, option in zip(OPTION_LETTERS, options):
+            text = _OPTION_LABEL.sub("", option).strip()
+            if not text:
+                raise ValueError("options must not be empty")
+            labelled.append(f"{letter}. {text}")
+        return labelled
+
+    @model_validator(mode="after")
+    def check_answer(self):
+        answer = self.answer.strip()
+        by_text = [option[0] for option in self.options if option[3:].lower() == _OPTION_LABEL.sub("", answer).lower()]
+        if by_text:
+            self.answer = by_text[0]
+        elif answer[:1].upper() in OPTION_LETTERS and (len(answer) == 1 or answer[1] in ".):"):
+            self.answer = answer[0].upper()
+        else:
+            raise ValueError(f"answer {answer!r} doesn't match any option")
+        return self
+
+
+# Function-calling schema for the quiz. Works with gpt-4 as well as models that support strict structured outputs.
+QUIZ_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "submit_quiz",
+        "description": "Submit the multiple-choice quiz questions.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "questions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "question": {"type": "string"},
+                            "options": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": 'Exactly four options labelled "A. ", "B. ", "C. " and "D. ".',
+                            },
+                            "answer": {"type": "string", "enum": list(OPTION_LETTERS)},
+                        },
+                        "required": ["question", "options", "answer"],
+                    },
+                },
+            },
+            "required": ["questions"],
+        },
+    },
+}
+QUIZ_TOOL_CHOICE = {"type": "function", "function": {"name": "submit_quiz"}}
+
+
+def validate_question(data):
+    """
+    Returns the normalised question as a dict, or None if it can't be repaired locally.
+    """
+    try:
+        return QuizQuestion.model_validate(data).model_dump()
+    except ValidationError as e:
+        logger.info("Dropping invalid quiz question: %s", e.errors()[0].get("msg"))
+        return None
+
+
+def validate_questions(objects):
+    """
+    Validates each question independently so one bad question doesn't sink the rest.
+    """
+    questions = []
+    for data in objects:
+        question = validate_question(data)
+        if question is not None:
+            questions.append(question)
+    return questions
+
+
+# "Step 2:" style labels only count with a separator, so "Part 2 of WWII" keeps its words
+_QUERY_PREFIX = re.compile(r"^\s*(?:(?:step|lesson|part)\s*\d+\s*(?:[:.)]|-\s)|\d{1,2}[.)]\s|[-*•])\s*", re.IGNORECASE)
+_QUERY_TRAILING = re.compile(r"[\s.,;:!-]+$")
+
+
+class LessonStep(BaseModel):
+    """
+    One step of a lesson plan: its position, the YouTube search query and the concept it teaches.
+    """
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    step: int = 0
+    query: str = Field(min_length=1)
+    concept: str = ""
+
+
+LESSON_PLAN_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "submit_lesson_plan",
+        "description": "Submit the ordered lesson plan.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "step": {"type": "integer", "description": "Position in the lesson, starting at 1."},
+                            "query": {"type": "string", "description": "A YouTube search query for this step."},
+                            "concept": {"type": "string", "description": "The concept this step teaches."},
+                        },
+                        "required": ["step", "query", "concept"],
+                    },
+                },
+            },
+            "required": ["steps"],
+        },
+    },
+}
+LESSON_PLAN_TOOL_CHOICE = {"type": "function", "function": {"name": "submit_lesson_plan"}}
+
+
+def normalize_query(query):
+    """
+    Cleans a search query written by the model: list numbering ("1.", "Step 2:"), bullets,
+    markdown emphasis, wrapping quotes and trailing punctuation are removed.
+    """
+    query = " ".join(query.replace("**", "").split())
+    query = _QUERY_PREFIX.sub("", query)
+    query = _QUERY_TRAILING.sub("", query).strip("\"'“”")  # Punctuation can sit outside the quotes: "Optics".
+    return _QUERY_TRAILING.sub("", query)
+
+
+def lesson_queries(objects, seen):
+    """
+    Validates lesson steps and returns the clean queries not already in `seen`.
+    `seen` holds lower-cased queries and is updated in place, so it can span a whole stream.
+    """
+    queries = []
+    for data in objects:
+        try:
+            step = LessonStep.model_validate(data)
+        except ValidationError as e:
+            logger.info("Dropping invalid lesson step: %s", e.errors()[0].get("msg"))
+            continue
+        query = normalize_query(step.query)
+        if query and query.lower() not in seen:
+            seen.add(query.lower())
+            queries.append(query)
+    return queries
@@ -0,0 +1,57 @@
+import re
+
+from . import config
+
+# Words that say nothing about which concept a query covers
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "how", "in", "into", "is", "it",
+    "of", "on", "or", "the", "to", "vs", "what", "with", "your",
+    "basics", "beginner", "beginners", "complete", "course", "explained", "guide", "introduction",
+    "lecture", "lesson", "overview", "tutorial", "understanding",
+}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def content_words(text, ignore=()):
+    """
+    Lower-cased, crudely singularised words of `text` minus stopwords and anything in `ignore`.
+    """
+    words = set()
+    for word in _WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue  # Before singularising, or "basics" would slip through as "basic"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word not in STOPWORDS and word not in ignore:
+            words.add(word)
+    return words
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateFilter:
+    """
+    Remembers the queries accepted so far and rejects new ones whose content words overlap
+    an accepted query by at least `threshold` (token-set Jaccard).
+    Words of the study topic itself appear in nearly every query, so they are ignored.
+    """
+
+    def __init__(self, topic="", threshold=None):
+        self.threshold = config.KEYWORD_SIMILARITY_THRESHOLD if threshold is None else threshold
+        self._ignore = content_words(topic)
+        self._accepted = []  # Content-word sets of accepted queries
+
+    def admit(self, query):
+        """
+        Returns True and remembers the query if it is new, False if it is a near-duplicate.
+        """
+        words = content_words(query, self._ignore)
+        if any(jaccard(words, other) >= self.threshold for other in self._accepted):
+            return False
+        self._accepted.append(words)
+        return True
+
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import os
+import threading
+
+from . import config
+from .cache import TieredCache
+from .executor import get_pool
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): SharedFlight falls back to running every call
+    fcntl = None
+
+# How often an async waiter retries a lock held by another worker
+_LOCK_POLL_INTERVAL = 0.1
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one.
+    The first caller runs the function; everyone who arrives while it is in flight
+    waits and receives the same result (or the same exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def join(self, key, default=None):
+        """
+        If a call for `key` is in flight, waits for it and returns its result (or raises its
+        exception). Otherwise returns `default` straight away without running anything.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+        if call is None:
+            return default
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Broadcast:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.items = []
+        self.done = False
+        self.error = None
+        self.followers = 0  # Guarded by StreamFlight._lock
+
+
+class StreamFlight:
+    """
+    SingleFlight for iterators: the first caller for a key drives fn() and everyone who
+    asks for the same key while it runs receives every item from the start, then each new
+    one as it is produced (or the same exception).
+    If the driving caller stops early (a client disconnecting), it still finishes the
+    stream for anyone following it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def stream(self, key, fn):
+        with self._lock:
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._streams[key] = _Broadcast()
+            else:
+                broadcast.followers += 1
+        if leader:
+            yield from self._lead(key, broadcast, fn)
+        else:
+            yield from self._follow(broadcast)
+
+    def follow(self, key):
+        """
+        Returns an iterator over the stream in flight for `key`, or None if there is none.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                return None
+            broadcast.followers += 1
+        return self._follow(broadcast)
+
+    def _publish(self, broadcast, item):
+        with broadcast.cond:
+            broadcast.items.append(item)
+            broadcast.cond.notify_all()
+
+    def _lead(self, key, broadcast, fn):
+        source = iter(fn())
+        error = None
+        try:
+            for item in source:
+                self._publish(broadcast, item)
+                yield item
+        except GeneratorExit:
+            with self._lock:
+                self._streams.pop(key, None)  # No one can start following from here on
+                followers = broadcast.followers
+            if followers:
+                try:
+                    for item in source:
+                        self._publish(broadcast, item)
+                except Exception as e:
+                    error = e
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+            with broadcast.cond:
+                broadcast.done = True
+                broadcast.error = error
+                broadcast.cond.notify_all()
+
+    def _follow(self, broadcast):
+        index = 0
+        while True:
+            with broadcast.cond:
+                while index >= len(broadcast.items) and not broadcast.done:
+                    broadcast.cond.wait()
+                items = broadcast.items[index:]
+                index += len(items)
+                done, error = broadcast.done, broadcast.error
+            yield from items
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop twin of SingleFlight for coroutine functions.
+    The shared call runs as its own task, so a waiter that disconnects (and is cancelled)
+    never cancels the work the others are waiting on.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        return await asyncio.shield(task)
+
+
+class SharedFlight:
+    """
+    Cross-worker single flight on local lock files, for several worker processes on one host.
+    The worker holding a key's lock computes the result and publishes it in a short-lived
+    cache; workers that were blocked on the same lock read it instead of computing again.
+    Keys hash onto a fixed set of lock files, so the directory never grows.
+    Results are only published when `accept(result)` is true (e.g. not an error).
+    Needs fcntl and an on-disk cache; without either it simply runs fn.
+    """
+
+    STRIPES = 1024
+
+    def __init__(self, name, ttl, accept=None, directory=None):
+        self.results = TieredCache(f"flight_{name}", ttl=ttl, max_memory=64, max_disk=1000)
+        self.accept = accept or (lambda result: True)
+        if directory is None and config.CACHE_DIR:
+            directory = os.path.join(config.CACHE_DIR, "locks", name)
+        self.directory = directory
+        self.enabled = fcntl is not None and bool(directory) and self.results.path is not None
+
+    def _open(self, key):
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha1(self.results._key(key).encode("utf-8")).hexdigest()
+        stripe = int(digest, 16) % self.STRIPES
+        return open(os.path.join(self.directory, f"{stripe:04d}.lock"), "a")
+
+    def _run(self, handle, key, fn):
+        try:
+            result = self.results.get(key)
+            if result is not None:
+                return result
+            result = fn()
+            if self.accept(result):
+                self.results.set(key, result)
+            return result
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def do(self, key, fn):
+        if not self.enabled:
+            return fn()
+        handle = self._open(key)
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return self._run(handle, key, fn)
+
+    async def ado(self, key, fn):
+        """
+        Async do() for coroutine functions; waits for the lock by polling so no thread is held.
+        """
+        if not self.enabled:
+            return await fn()
+        handle = self._open(key)
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(_LOCK_POLL_INTERVAL)
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(get_pool("stage"), self.results.get, key)
+            if result is not None:
+                return result
+            result = await fn()
+            if self.accept(result):
+                await loop.run_in_executor(get_pool("stage"), self.results.set, key, result)
+            return result
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
@@ -0,0 +1,68 @@
+import html
+import re
+from collections import namedtuple
+
+Segment = namedtuple("Segment", ["start", "end", "text"])
+
+_TIMING = re.compile(r"^\s*((?:\d+:)?\d{1,2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}\.\d{3})")
+_TAG = re.compile(r"<[^>]*>")  # Inline word timings like <00:00:08.400> and <c>…</c> styling
+
+
+def parse_timestamp(timestamp):
+    """
+    Converts a WebVTT timestamp ("01:02:03.450" or "02:03.450") to seconds.
+    """
+    seconds = 0.0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def iter_segments(lines):
+    """
+    Parses WebVTT in a single pass over `lines` (any iterable of strings, e.g. an open file)
+    and yields Segment(start, end, text) for each line of caption text actually spoken.
+    Inline markup is stripped, and the rolling-cue duplication in YouTube auto-captions
+    (every line repeated across two or three consecutive cues) is collapsed.
+    """
+    last_text = None
+    cue = None  # (start, end) of the cue whose text lines we are reading
+    skipping_block = False  # Inside a NOTE / STYLE / REGION block
+
+    for line in lines:
+        # Only a truly empty line ends a cue; auto-captions use whitespace-only text lines
+        if not line.rstrip("\r\n"):
+            cue = None
+            skipping_block = False
+            continue
+        if skipping_block:
+            continue
+        line = line.strip()
+
+        if cue is None:
+            timing = _TIMING.match(line)
+            if timing:
+                cue = (parse_timestamp(timing.group(1)), parse_timestamp(timing.group(2)))
+            elif line.startswith(("NOTE", "STYLE", "REGION")):
+                skipping_block = True
+            # Anything else outside a cue is the header or a cue identifier
+            continue
+        if not line:
+            continue
+
+        text = " ".join(html.unescape(_TAG.sub("", line)).split())
+        if not text or text == last_text:
+            continue
+        last_text = text
+        yield Segment(cue[0], cue[1], text)
+
+
+def transcript_text(vtt):
+    """
+    Returns the spoken text of a WebVTT document as one clean string.
+    Input that isn't WebVTT is returned unchanged.
+    """
+    segments = [segment.text for segment in iter_segments(vtt.splitlines())]
+    if not segments:
+        return vtt
+    return " ".join(segments)
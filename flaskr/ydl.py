@@ -0,0 +1,106 @@
+import contextlib
+import json
+import logging
+import threading
+
+import yt_dlp
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.uses = 0
+
+
+class YdlPool:
+    """
+    Long-lived yt_dlp.YoutubeDL instances, one set per option set.
+    Building a YoutubeDL loads every extractor and sets up cookies and HTTP handlers,
+    so instances are kept and reused instead of being made per call.
+    YoutubeDL is not thread-safe: checkout() hands an instance to exactly one thread
+    until it is returned. Up to `max_idle` idle instances are kept per option set,
+    and an instance is closed and replaced after `max_uses` checkouts so per-instance
+    state (cookies, caches, counters) cannot grow without bound.
+    """
+
+    def __init__(self, max_idle=None, max_uses=None):
+        self.max_idle = config.YDL_POOL_SIZE if max_idle is None else max_idle
+        self.max_uses = config.YDL_MAX_USES if max_uses is None else max_uses
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(opts):
+        return json.dumps(opts, sort_keys=True, default=repr)
+
+    def _take(self, key, opts):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        return _Slot(yt_dlp.YoutubeDL(dict(opts)))
+
+    def _give_back(self, key, slot):
+        slot.uses += 1
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if slot.uses < self.max_uses and len(idle) < self.max_idle:
+                idle.append(slot)
+                return
+        slot.ydl.close()
+
+    @contextlib.contextmanager
+    def checkout(self, opts):
+        """
+        Lends out a YoutubeDL built with `opts` for the duration of the with-block.
+        Ordinary errors (no subtitles, video unavailable) leave the instance usable;
+        one interrupted by anything else is closed rather than reused.
+        """
+        key = self._key(opts)
+        slot = self._take(key, opts)
+        try:
+            yield slot.ydl
+        except Exception:
+            self._give_back(key, slot)
+            raise
+        except BaseException:
+            slot.ydl.close()
+            raise
+        self._give_back(key, slot)
+
+    def warm(self, opts, count=1):
+        """
+        Builds `count` idle instances for `opts` ahead of the first request.
+        """
+        key = self._key(opts)
+        slots = [_Slot(yt_dlp.YoutubeDL(dict(opts))) for _ in range(count)]
+        with self._lock:
+            self.created += count
+            idle = self._idle.setdefault(key, [])
+            while slots and len(idle) < self.max_idle:
+                idle.append(slots.pop())
+        for slot in slots:
+            slot.ydl.close()
+
+    def close(self):
+        with self._lock:
+            slots = [slot for idle in self._idle.values() for slot in idle]
+            self._idle.clear()
+        for slot in slots:
+            slot.ydl.close()
+
+    def stats(self):
+        with self._lock:
+            idle = sum(len(slots) for slots in self._idle.values())
+            return {"created": self.created, "reused": self.reused, "idle": idle, "option_sets": len(self._idle)}
+
+
+pool = YdlPool()
@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scripts that call the live OpenAI / YouTube APIs as soon as they are imported; run them by hand
+collect_ignore = ["test_app.py", "test_ytube.py", "test_ytube_module.py"]
+
+
+class FakeClock:
+    """
+    Stands in for the `time` module of the code under test: time() only moves when a test
+    advances it, or when the code sleeps.
+    """
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.slept = []  # Every non-zero sleep, in order
+
+    def time(self):
+        return self.now
+
+    monotonic = perf_counter = time
+
+    def sleep(self, seconds):
+        if seconds:
+            self.slept.append(seconds)
+        self.now += seconds
+
+
+def wait_until(condition, timeout=2):
+    """
+    Polls `condition` until it is true; for results produced on background threads.
+    """
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
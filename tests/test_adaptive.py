@@ -0,0 +1,104 @@
+import pytest
+
+from flaskr import config, routes
+from flaskr.adaptive import PassRateTracker
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_ADAPTIVE", True)
+    monkeypatch.setattr(config, "SEARCH_OVERFETCH_MARGIN", 1.2)
+    monkeypatch.setattr(config, "SEARCH_MAX_FETCH", 40)
+
+
+def entries(durations):
+    return [
+        {"id": f"{n:011d}", "title": f"Video {n}", "url": f"https://www.youtube.com/watch?v={n:011d}", "duration": duration}
+        for n, duration in enumerate(durations)
+    ]
+
+
+class FakeSearch:
+    """
+    Stands in for routes.search_entries: the first `count` of a fixed result list.
+    """
+
+    def __init__(self, results):
+        self.results = results
+        self.counts = []
+
+    def __call__(self, query, count):
+        self.counts.append(count)
+        return self.results[:count]
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = PassRateTracker(prior=0.5, weight=0.5)
+    monkeypatch.setattr(routes, "pass_rates", tracker)
+    return tracker
+
+
+def use_search(monkeypatch, durations):
+    search = FakeSearch(entries(durations))
+    monkeypatch.setattr(routes, "search_entries", search)
+    return search
+
+
+def test_fetch_size_follows_the_pass_rate():
+    tracker = PassRateTracker(prior=0.5, weight=0.5)
+    assert tracker.fetch_count("medium", 5) == 12  # 5 / 0.5 * 1.2
+
+    for _ in range(5):
+        tracker.record("medium", 10, 10)
+    assert tracker.rate("medium") > 0.95
+    assert tracker.fetch_count("medium", 5) == 7
+
+    for _ in range(10):
+        tracker.record("medium", 0, 10)
+    assert tracker.rate("medium") == tracker.floor
+    assert tracker.fetch_count("medium", 5) == 40  # Capped at SEARCH_MAX_FETCH
+
+
+def test_fetch_size_never_drops_below_the_target():
+    tracker = PassRateTracker(prior=1.0)
+    assert tracker.fetch_count("short", 5, have=4, fetched=4) == 6
+    assert tracker.fetch_count("short", 5, have=5, fetched=5) == 5
+    assert tracker.fetch_count("short", 5) == 6
+
+
+def test_empty_searches_do_not_move_the_estimate():
+    tracker = PassRateTracker(prior=0.5)
+    tracker.record("long", 0, 0)
+    assert tracker.rate("long") == 0.5
+
+
+def test_one_search_is_enough_at_the_expected_pass_rate(monkeypatch, tracker):
+    search = use_search(monkeypatch, [600, 60] * 30)
+    videos = routes.fetch_youtube_videos("optics", max_results=5, duration_filter="medium")
+    assert [video["id"] for video in videos] == [f"{n:011d}" for n in (0, 2, 4, 6, 8)]
+    assert search.counts == [12]
+    assert tracker.rate("medium") == 0.5
+
+
+def test_a_low_pass_rate_searches_deeper_and_grows_the_next_fetch(monkeypatch, tracker):
+    search = use_search(monkeypatch, [600, 60, 60, 60, 60] * 20)
+    videos = routes.fetch_youtube_videos("optics", max_results=5, duration_filter="medium")
+    assert len(videos) == 5
+    assert search.counts[0] == 12
+    assert search.counts == sorted(search.counts) and len(search.counts) > 1
+    assert search.counts[-1] <= 40
+    assert tracker.fetch_count("medium", 5) > 12
+
+
+def test_deepening_stops_at_the_fetch_cap(monkeypatch, tracker):
+    search = use_search(monkeypatch, [60] * 100)
+    assert routes.fetch_youtube_videos("optics", max_results=5, duration_filter="medium") == []
+    assert search.counts[-1] == 40
+
+
+def test_deepening_stops_once_the_results_run_out(monkeypatch, tracker):
+    search = use_search(monkeypatch, [600, 60, 60, 60, 60, 60, 60])
+    videos = routes.fetch_youtube_videos("optics", max_results=5, duration_filter="medium")
+    assert [video["id"] for video in videos] == ["00000000000"]
+    assert search.counts == [12]
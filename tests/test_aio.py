@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import time
+
+from flaskr import aio, config
+from flaskr.executor import get_pool
+
+
+def test_a_search_stuck_behind_a_busy_pool_gives_up_at_its_deadline():
+    pool = get_pool("search")
+    release = threading.Event()
+    blockers = [pool.submit(release.wait, 5) for _ in range(config.SEARCH_POOL_SIZE)]
+
+    async def search():
+        loop = asyncio.get_running_loop()
+        return await aio._search("fun_videos", lambda: ["video"], deadline=loop.time() + 0.2)
+
+    start = time.monotonic()
+    try:
+        assert asyncio.run(search()) is None
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+
+
+def test_a_search_returns_its_result_within_the_deadline():
+    async def search():
+        loop = asyncio.get_running_loop()
+        return await aio._search("fun_videos", lambda: ["video"], deadline=loop.time() + 5)
+
+    assert asyncio.run(search()) == ["video"]
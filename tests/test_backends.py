@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from flaskr.backends import InnerTubeBackend, parse_duration, parse_view_count
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "innertube_search.json")
+
+
+@pytest.fixture
+def backend():
+    """
+    An InnerTubeBackend that answers from the fixture's pages in order and records each request body.
+    """
+    with open(FIXTURE) as f:
+        pages = json.load(f)["pages"]
+    backend = InnerTubeBackend()
+    backend.requests = []
+
+    def post(body):
+        backend.requests.append(body)
+        return pages[len(backend.requests) - 1]
+
+    backend._post = post
+    return backend
+
+
+def test_first_page_results_skip_ads_and_shorts(backend):
+    entries = backend.search("photosynthesis", 4)
+    assert [entry["id"] for entry in entries] == ["exVideo0001", "exVideo0002", "exVideo0003", "exLive00001"]
+    assert entries[0] == {
+        "id": "exVideo0001",
+        "title": "Photosynthesis: Light Reactions",
+        "url": "https://www.youtube.com/watch?v=exVideo0001",
+        "channel": "Example Science Channel",
+        "duration": 751,
+        "view_count": 1234567,
+    }
+    assert [entry["duration"] for entry in entries] == [751, 302, 3723, None]
+    assert [entry["view_count"] for entry in entries] == [1234567, 98765, 0, 1024]
+    assert len(backend.requests) == 1
+    assert backend.requests[0]["params"] == InnerTubeBackend.VIDEOS_ONLY
+
+
+def test_deeper_searches_follow_the_continuation_token(backend):
+    entries = backend.search("photosynthesis", 6)
+    assert [entry["id"] for entry in entries] == [
+        "exVideo0001", "exVideo0002", "exVideo0003", "exLive00001", "exVideo0004", "exVideo0005",
+    ]
+    assert backend.requests[1]["continuation"] == "EXAMPLE_PAGE_2_TOKEN"
+    assert "query" not in backend.requests[1]
+
+
+def test_walk_returns_the_page_token_and_no_ad_renderers(backend):
+    with open(FIXTURE) as f:
+        first_page = json.load(f)["pages"][0]
+    renderers, token = backend._walk(first_page)
+    assert token == "EXAMPLE_PAGE_2_TOKEN"
+    assert "adVideo0001" not in [renderer["videoId"] for renderer in renderers]
+
+
+def test_text_formats_are_parsed():
+    assert parse_duration("4:13") == 253
+    assert parse_duration("LIVE") is None
+    assert parse_view_count("1,234 views") == 1234
+    assert parse_view_count("No views") == 0
+    assert parse_view_count(None) is None
@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from conftest import FakeClock, wait_until
+from flaskr import cache as cache_module
+from flaskr.cache import TieredCache, normalize_text
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("ttl", 10)
+    return TieredCache("test", path=str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_normalize_text():
+    assert normalize_text("  Machine   LEARNING ") == "machine learning"
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set(("topic", 1), {"value": 1})
+    assert cache.get(("topic", 1)) == {"value": 1}
+
+    clock.now += 11
+    assert cache.get(("topic", 1)) is None
+    assert cache.get(("topic", 1), "default") == "default"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_disk_tier_outlives_the_instance(tmp_path, clock):
+    make_cache(tmp_path).set("key", [1, 2])
+    assert make_cache(tmp_path).get("key") == [1, 2]
+
+
+def test_namespaces_share_a_file_without_mixing(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache("a", ttl=10, path=path).set("key", "a")
+    assert TieredCache("b", ttl=10, path=path).get("key") is None
+
+
+def test_delete_removes_both_tiers(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set("key", 1)
+    cache.delete("key")
+    assert cache.get("key") is None
+    assert make_cache(tmp_path).get("key") is None
+
+
+def test_get_or_compute_only_computes_on_a_miss(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    calls = []
+    compute = lambda: calls.append(1) or "value"
+    assert cache.get_or_compute("key", compute) == "value"
+    assert cache.get_or_compute("key", compute) == "value"
+    assert len(calls) == 1
+
+
+def test_failed_compute_is_not_cached(tmp_path, clock):
+    cache = make_cache(tmp_path)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("key", fail)
+    assert cache.get_or_compute("key", lambda: "value") == "value"
+
+
+def test_stale_entry_is_served_while_it_refreshes(tmp_path, clock):
+    cache = make_cache(tmp_path, stale_ttl=60)
+    cache.set("key", "old")
+    clock.now += 30  # Past the TTL, inside the stale window
+
+    assert cache.get_or_compute("key", lambda: "new") == "old"
+    assert cache.stats()["stale_hits"] == 1
+    wait_until(lambda: cache.get("key") == "new")
+
+
+def test_entry_past_the_stale_window_is_recomputed_inline(tmp_path, clock):
+    cache = make_cache(tmp_path, stale_ttl=60)
+    cache.set("key", "old")
+    clock.now += 100
+    assert cache.get_or_compute("key", lambda: "new") == "new"
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = TieredCache("test", ttl=10, max_memory=2, path="")  # Memory only
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_keeps_the_newest_max_disk_entries(tmp_path, clock):
+    cache = make_cache(tmp_path, max_disk=10)
+    for index in range(cache_module._PRUNE_EVERY):
+        clock.now += 0.001
+        cache.set(index, index)
+
+    with sqlite3.connect(cache.path) as db:
+        keys = sorted(int(row[0]) for row in db.execute("SELECT key FROM cache WHERE namespace = 'test'"))
+    assert keys == list(range(cache_module._PRUNE_EVERY - 10, cache_module._PRUNE_EVERY))
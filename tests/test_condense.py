@@ -0,0 +1,51 @@
+import re
+
+from flaskr import config
+from flaskr.condense import clean_text, condense_transcript, estimate_tokens
+
+# 100 numbered sentences of 4 words each, about 6 tokens apiece
+LECTURE = " ".join(f"Sentence {n} covers optics." for n in range(100))
+
+
+def sentence_numbers(text):
+    return [int(n) for n in re.findall(r"Sentence (\d+)", text)]
+
+
+def test_estimate_tokens_counts_four_per_three_words():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("one two three") == 4
+    assert estimate_tokens("one two three four") == 6
+
+
+def test_clean_text_drops_fillers_sound_tags_and_stutters():
+    assert clean_text("[Music] um so the the lens uh bends light [Applause]") == "so the lens bends light"
+
+
+def test_a_short_transcript_is_kept_whole_without_repeated_lines():
+    condensed = condense_transcript("Light bends. Light bends. Lenses focus it.", budget=100)
+    assert condensed.text == "Light bends. Lenses focus it."
+    assert condensed.tokens == condensed.source_tokens == estimate_tokens(condensed.text)
+
+
+def test_a_long_transcript_is_sampled_across_the_whole_timeline():
+    condensed = condense_transcript(LECTURE, budget=60, chunks=4)
+    parts = condensed.text.split(" … ")
+    assert len(parts) == 4
+    assert [sentence_numbers(part)[0] for part in parts] == [0, 25, 50, 75]
+    assert condensed.source_tokens == 600
+    assert estimate_tokens(" ".join(parts)) <= 60
+
+
+def test_unused_budget_rolls_over_to_later_windows():
+    # The first half of the timeline has a single sentence, so its share goes to the second half
+    transcript = "Sentence 0 covers optics. " + " ".join(f"Sentence {n} covers optics." for n in range(50, 100))
+    condensed = condense_transcript(transcript, budget=60, chunks=2)
+    numbers = sentence_numbers(condensed.text)
+    assert numbers[0] == 0
+    assert len(numbers) == 10  # 6 tokens each: 1 in the first window, 9 in the second
+
+
+def test_zero_chunks_means_one_window(monkeypatch):
+    assert sentence_numbers(condense_transcript(LECTURE, budget=60, chunks=0).text) == list(range(10))
+    monkeypatch.setattr(config, "QUIZ_TRANSCRIPT_CHUNKS", 0)
+    assert sentence_numbers(condense_transcript(LECTURE, budget=60).text) == list(range(10))
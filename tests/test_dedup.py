@@ -0,0 +1,62 @@
+import threading
+
+from flaskr.dedup import SeenVideos, video_id
+
+ID = "dQw4w9WgXcQ"
+
+
+def test_video_ids_are_found_in_every_url_shape():
+    for url in [
+        f"https://www.youtube.com/watch?v={ID}",
+        f"https://www.youtube.com/watch?feature=share&v={ID}&t=42s",
+        f"https://youtu.be/{ID}?si=abc",
+        f"https://www.youtube.com/shorts/{ID}",
+        f"https://www.youtube.com/embed/{ID}?autoplay=1",
+        f"https://m.youtube.com/live/{ID}",
+        ID,
+    ]:
+        assert video_id(url) == ID, url
+
+
+def test_video_ids_come_from_the_dict_id_before_the_url():
+    assert video_id({"id": ID, "url": "https://example.com/elsewhere"}) == ID
+    assert video_id({"id": "not an id", "url": f"https://youtu.be/{ID}"}) == ID
+
+
+def test_urls_without_a_video_id_give_none():
+    assert video_id("https://www.youtube.com/watch?v=short") is None
+    assert video_id("https://www.youtube.com/channel/UC1234567890") is None
+    assert video_id({"url": None}) is None
+    assert video_id(None) is None
+
+
+def test_claim_keeps_only_unseen_videos_up_to_the_limit():
+    seen = SeenVideos()
+    first = [{"url": f"https://youtu.be/{n:011d}"} for n in range(3)]
+    assert seen.claim(first) == first
+    again = [{"id": f"{n:011d}"} for n in range(5)]
+    assert seen.claim(again, limit=1) == [{"id": "00000000003"}]
+    assert seen.claim(again) == [{"id": "00000000004"}]  # The one left unclaimed is still free
+
+
+def test_videos_without_an_id_are_keyed_by_url():
+    seen = SeenVideos()
+    assert seen.claim([{"url": "https://example.com/a"}, {"url": "https://example.com/a"}]) == [{"url": "https://example.com/a"}]
+
+
+def test_concurrent_claims_never_hand_out_a_video_twice():
+    seen = SeenVideos()
+    videos = [{"id": f"{n:011d}"} for n in range(500)]
+    claimed = []
+    start = threading.Barrier(8)
+
+    def claim():
+        start.wait()
+        claimed.extend(seen.claim(videos))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(video["id"] for video in claimed) == [video["id"] for video in videos]
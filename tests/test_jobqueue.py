@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from conftest import FakeClock, wait_until
+from flaskr import jobqueue as jobqueue_module
+from flaskr.jobqueue import JobQueue, Workers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(jobqueue_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue("test", path=str(tmp_path / "jobs.sqlite"), lease=60, max_attempts=2, keep=3600)
+
+
+def test_enqueueing_a_pending_key_returns_the_same_job(queue):
+    first = queue.enqueue("video", {"youtubeId": "video"})
+    assert queue.enqueue("video", {"youtubeId": "video"}) == first
+    assert queue.stats() == {"name": "test", "queued": 1}
+
+
+def test_claims_take_the_highest_priority_first(queue):
+    queue.enqueue("low", {"n": 1}, priority=-2)
+    queue.enqueue("high", {"n": 2}, priority=0)
+    queue.enqueue("low", {"n": 1}, priority=5)  # Re-enqueueing raises the priority
+
+    assert [queue.claim()[1] for _ in range(2)] == ["low", "high"]
+    assert queue.claim() is None
+
+
+def test_a_claim_is_a_lease(queue, clock):
+    job_id = queue.enqueue("video", {"a": 1})
+    assert queue.claim() == (job_id, "video", {"a": 1})
+    assert queue.claim() is None
+    assert queue.running("video")
+
+    clock.now += 61  # The worker died without finishing
+    assert not queue.running("video")
+    assert queue.claim() == (job_id, "video", {"a": 1})
+
+
+def test_failed_jobs_are_retried_up_to_max_attempts(queue):
+    job_id = queue.enqueue("video", {})
+    queue.claim()
+    queue.fail(job_id, Exception("transient"))
+    assert queue.state("video") == "queued"
+
+    queue.claim()
+    queue.fail(job_id, Exception("still broken"))
+    assert queue.state("video") == "failed"
+    assert queue.claim() is None
+
+
+def test_finished_jobs_start_afresh_when_enqueued_again(queue):
+    job_id = queue.enqueue("video", {})
+    queue.claim()
+    queue.complete(job_id)
+    assert queue.state("video") == "done"
+
+    assert queue.enqueue("video", {}) == job_id
+    assert queue.state("video") == "queued"
+
+
+def test_cancel_drops_a_queued_job(queue):
+    queue.enqueue("video", {})
+    assert queue.cancel("video")
+    assert queue.claim() is None
+    assert queue.state("video") == "cancelled"
+    assert not queue.cancel("video")
+
+
+def test_a_job_cancelled_while_running_stays_cancelled(queue):
+    job_id = queue.enqueue("video", {})
+    queue.claim()
+    assert queue.cancel("video")
+    queue.complete(job_id)
+    assert queue.state("video") == "cancelled"
+
+
+def test_wait_blocks_while_the_job_runs(queue, clock):
+    queue.enqueue("video", {})
+    assert queue.wait("video", timeout=120)  # Queued, not running
+    assert clock.now == 1_000_000
+    queue.claim()
+    assert queue.wait("video", timeout=120)  # Sleeping on the fake clock runs the lease out
+    assert 1_000_060 <= clock.now < 1_000_061
+
+
+def test_wait_gives_up_after_its_timeout(queue, clock):
+    queue.enqueue("video", {})
+    queue.claim()
+    assert not queue.wait("video", timeout=5)
+    assert 1_000_005 <= clock.now < 1_000_006
+    assert queue.running("video")
+
+
+def test_a_job_left_running_by_a_restarted_process_expires(tmp_path, clock):
+    path = str(tmp_path / "jobs.sqlite")
+    job_id = JobQueue("test", path=path, lease=30).enqueue("video", {})
+    JobQueue("test", path=path, lease=30).claim()  # Claimed, then the process went away
+
+    queue = JobQueue("test", path=path, lease=30)
+    assert queue.running("video")
+    clock.now += 31  # No heartbeat renewed the lease
+    assert not queue.running("video")
+    assert queue.claim() == (job_id, "video", {})
+
+
+def test_heartbeats_renew_the_lease(queue, clock):
+    job_id = queue.enqueue("video", {})
+    queue.claim()
+    clock.now += 50
+    queue.heartbeat([job_id])
+    clock.now += 50
+    assert queue.running("video")
+    assert queue.claim() is None
+
+
+def test_workers_run_jobs_and_record_failures(tmp_path):
+    queue = JobQueue("test", path=str(tmp_path / "jobs.sqlite"), max_attempts=1)
+    seen = []
+
+    def handler(payload):
+        if payload["fail"]:
+            raise ValueError("boom")
+        seen.append(payload["n"])
+
+    workers = Workers(queue, handler, count=2, poll=0.05)
+    workers.start()
+    try:
+        queue.enqueue("ok", {"n": 1, "fail": False})
+        queue.enqueue("bad", {"n": 2, "fail": True})
+        wait_until(lambda: queue.state("ok") == "done" and queue.state("bad") == "failed")
+    finally:
+        workers.stop()
+    assert seen == [1]
+
+
+def test_workers_keep_long_jobs_leased(tmp_path):
+    queue = JobQueue("test", path=str(tmp_path / "jobs.sqlite"), lease=0.3)
+    release = threading.Event()
+    workers = Workers(queue, lambda payload: release.wait(2), count=1, poll=0.05)
+    workers.start()
+    try:
+        queue.enqueue("slow", {})
+        wait_until(lambda: queue.running("slow"))
+        time.sleep(0.6)  # Twice the lease
+        assert queue.running("slow")
+        assert queue.claim() is None
+        release.set()
+        wait_until(lambda: queue.state("slow") == "done")
+    finally:
+        release.set()
+        workers.stop()
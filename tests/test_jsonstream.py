@@ -0,0 +1,31 @@
+from flaskr.jsonstream import JsonObjectStream, iter_json_objects
+
+ANSWER = '```json\n{"questions": [{"question": "Why {braces}?", "answer": "A"}, {"question": "Say \\"hi\\"", "options": [{"x": 1}]}]}\n```'
+
+
+def test_objects_are_returned_as_soon_as_they_close():
+    stream = JsonObjectStream()
+    found = []
+    for index in range(0, len(ANSWER), 7):  # Chunks split strings, escapes and braces
+        found.append(stream.feed(ANSWER[index:index + 7]))
+
+    objects = [obj for chunk in found for obj in chunk]
+    assert objects == [
+        {"question": "Why {braces}?", "answer": "A"},
+        {"question": 'Say "hi"', "options": [{"x": 1}]},
+    ]
+    first_chunk = next(index for index, chunk in enumerate(found) if chunk)
+    assert first_chunk < len(found) - 2  # The first object did not wait for the end of the answer
+
+
+def test_bare_arrays_and_surrounding_prose():
+    text = 'Here you go: [{"step": 1}, {"step": 2}] "quoted prose" {not json}'
+    assert iter_json_objects(text) == [{"step": 1}, {"step": 2}]
+
+
+def test_malformed_objects_are_skipped():
+    assert iter_json_objects('[{"a": 1,}, {"b": 2}]') == [{"b": 2}]
+
+
+def test_text_without_an_array_yields_nothing():
+    assert iter_json_objects('{"question": "no array here"}') == []
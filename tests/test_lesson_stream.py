@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from flask import Flask
+
+from flaskr import routes
+
+
+def video(name, is_fun=False):
+    return {"id": name, "title": name, "url": f"https://www.youtube.com/watch?v={name}", "channel": "c", "is_fun": is_fun}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(routes.bp)
+    return app.test_client()
+
+
+def stream_events(client):
+    response = client.post("/process/stream", json={"studyTopic": "Optics", "randomTheme": "cats"})
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_a_replayed_lesson_keeps_its_keyword_slots():
+    playlist = [video("fun1", True), video("a1"), video("a2"), video("fun2", True), video("c1"), video("fun3", True)]
+    outline = {"keywords": ["Optics basics", "Lenses", "Mirrors"], "slots": [2, 0, 1]}
+
+    events = routes.replay_lesson(playlist, 200, outline)
+    assert events[0] == {"type": "plan", "keywords": ["Optics basics", "Lenses", "Mirrors"]}
+    assert [(event["index"], [v["id"] for v in event["videos"]]) for event in events[1:-1]] == [
+        (0, ["fun1", "a1", "a2", "fun2"]),
+        (1, []),
+        (2, ["c1", "fun3"]),
+    ]
+    assert events[-1] == {"type": "done"}
+    assert routes.playlist_from_events(events) == (playlist, 200, outline)
+
+
+def test_a_failed_lesson_replays_as_an_error():
+    assert routes.replay_lesson({"error": "Error in GPT-4 call: boom"}, 500, None) == [
+        {"type": "error", "error": "Error in GPT-4 call: boom"},
+    ]
+
+
+def test_the_stream_ends_with_an_error_when_the_pipeline_raises(client, monkeypatch):
+    def lesson_events(study_topic, duration, random_theme):
+        yield {"type": "plan", "keywords": ["Optics basics"]}
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(routes, "lesson_events", lesson_events)
+    assert stream_events(client) == [
+        {"type": "plan", "keywords": ["Optics basics"]},
+        {"type": "error", "error": "database is locked"},
+    ]
+
+
+def test_a_stream_joining_a_process_run_replays_its_outline(client, monkeypatch):
+    playlist = [video("a1"), video("b1"), video("fun1", True)]
+    outline = {"keywords": ["Optics basics", "Lenses"], "slots": [1, 1]}
+    monkeypatch.setattr(routes.process_flight, "join", lambda key, default=None: (playlist, 200, outline))
+    assert stream_events(client) == [
+        {"type": "plan", "keywords": ["Optics basics", "Lenses"]},
+        {"type": "videos", "index": 0, "videos": [video("a1")]},
+        {"type": "videos", "index": 1, "videos": [video("b1"), video("fun1", True)]},
+        {"type": "done"},
+    ]
@@ -0,0 +1,211 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from conftest import FakeClock
+from flaskr import llm as llm_module
+from flaskr.llm import LLMGateway, TokenBucket
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(cls, status, headers=None):
+    return cls("error", response=httpx.Response(status, headers=headers or {}, request=REQUEST), body=None)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncStream(FakeStream):
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """
+    chat.completions.create returns (or raises) the given results in order.
+    """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class FakeAsyncClient(FakeClient):
+    async def create(self, **kwargs):
+        return FakeClient.create(self, **kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_module, "time", clock)
+    # Backoff waits the full exponential ceiling, so delays are predictable
+    monkeypatch.setattr(llm_module, "random", SimpleNamespace(uniform=lambda low, high: high))
+    return clock
+
+
+def gateway(client=None, async_client=None, **overrides):
+    options = dict(max_in_flight=1, rate=0, burst=1, retries=3, timeout=5, backoff_base=1, backoff_max=20)
+    options.update(overrides)
+    return LLMGateway(client, async_client, **options)
+
+
+def slot_free(gateway):
+    if not gateway._slots.acquire(blocking=False):
+        return False
+    gateway._slots.release()
+    return True
+
+
+def test_retryable_errors_back_off_exponentially(clock):
+    client = FakeClient(
+        status_error(openai.InternalServerError, 500),
+        openai.APIConnectionError(request=REQUEST),
+        status_error(openai.RateLimitError, 429),
+        "answer",
+    )
+    llm = gateway(client)
+    assert llm.create(model="m") == "answer"
+    assert clock.slept == [1, 2, 4]
+    assert llm.stats() == {"calls": 4, "retried": 3, "failed": 0}
+    assert slot_free(llm)
+
+
+def test_retry_after_hints_are_honoured_and_capped(clock):
+    client = FakeClient(
+        status_error(openai.RateLimitError, 429, {"retry-after": "7"}),
+        status_error(openai.RateLimitError, 429, {"retry-after-ms": "1500"}),
+        status_error(openai.RateLimitError, 429, {"retry-after": "600"}),
+        "answer",
+    )
+    assert gateway(client).create(model="m") == "answer"
+    assert clock.slept == [7, 1.5, 20]
+
+
+def test_client_errors_are_not_retried(clock):
+    client = FakeClient(status_error(openai.BadRequestError, 400), "answer")
+    llm = gateway(client)
+    with pytest.raises(openai.BadRequestError):
+        llm.create(model="m")
+    assert client.calls == 1
+    assert clock.slept == []
+    assert llm.stats() == {"calls": 1, "retried": 0, "failed": 1}
+    assert slot_free(llm)
+
+
+def test_retries_give_up_after_the_limit(clock):
+    client = FakeClient(*[status_error(openai.InternalServerError, 503) for _ in range(4)])
+    llm = gateway(client, retries=2)
+    with pytest.raises(openai.InternalServerError):
+        llm.create(model="m")
+    assert client.calls == 3
+    assert clock.slept == [1, 2]
+
+
+def test_the_token_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+    clock.now += 1.5  # Pays back the debt and earns one token
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0.5
+    assert TokenBucket(rate=0, burst=1).reserve() == 0
+
+
+def test_calls_wait_for_the_rate_limiter(clock):
+    llm = gateway(FakeClient("a", "b", "c"), rate=2, burst=1)
+    assert [llm.create(model="m") for _ in range(3)] == ["a", "b", "c"]
+    assert clock.slept == [0.5, 0.5]
+
+
+def test_an_exhausted_stream_releases_its_slot(clock):
+    llm = gateway(FakeClient(FakeStream([1, 2, 3])))
+    stream = llm.create(model="m", stream=True)
+    assert not slot_free(llm)
+    assert list(stream) == [1, 2, 3]
+    assert slot_free(llm)
+
+
+def test_a_closed_stream_releases_its_slot_and_connection(clock):
+    raw = FakeStream([1, 2, 3])
+    llm = gateway(FakeClient(raw))
+    stream = llm.create(model="m", stream=True)
+    assert next(stream) == 1
+    stream.close()
+    assert raw.closed
+    assert slot_free(llm)
+
+
+def test_an_abandoned_stream_releases_its_slot_and_connection(clock):
+    raw = FakeStream([1, 2, 3])
+    llm = gateway(FakeClient(raw))
+    stream = llm.create(model="m", stream=True)
+    next(stream)
+    del stream
+    gc.collect()
+    assert raw.closed
+    assert slot_free(llm)
+
+
+def test_a_stream_that_fails_to_open_releases_its_slot(clock):
+    llm = gateway(FakeClient(status_error(openai.BadRequestError, 400)))
+    with pytest.raises(openai.BadRequestError):
+        llm.create(model="m", stream=True)
+    assert slot_free(llm)
+
+
+def test_an_abandoned_async_stream_is_closed_on_its_loop(clock):
+    raw = FakeAsyncStream([1, 2, 3])
+    llm = gateway(async_client=FakeAsyncClient(raw))
+
+    async def abandon():
+        stream = await llm.acreate(model="m", stream=True)
+        assert await stream.__anext__() == 1
+        del stream
+        gc.collect()
+        assert slot_free(llm)
+        for _ in range(3):
+            await asyncio.sleep(0)  # Lets the scheduled close() run
+        return raw.closed
+
+    assert asyncio.run(abandon())
+
+
+def test_an_exhausted_async_stream_is_closed(clock):
+    raw = FakeAsyncStream([1, 2])
+    llm = gateway(async_client=FakeAsyncClient(raw))
+
+    async def consume():
+        return [chunk async for chunk in await llm.acreate(model="m", stream=True)]
+
+    assert asyncio.run(consume()) == [1, 2]
+    assert raw.closed
+    assert slot_free(llm)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from flaskr.pipeline import TaskFailed, TaskGraph
+
+
+@pytest.fixture
+def release():
+    # Blocks "slow" tasks until the test is over, so no pool thread outlives it
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_dependencies_receive_results_in_order():
+    graph = TaskGraph()
+    graph.add("sum", lambda a, b: a + b, deps=["a", "b"])
+    graph.add("a", lambda: 1)
+    graph.add("b", lambda: 2)
+    graph.join()
+    assert graph.get("sum") == 3
+    assert graph.error("sum") is None
+
+
+def test_a_failed_dependency_fails_its_dependents():
+    graph = TaskGraph()
+
+    def fail():
+        raise ValueError("boom")
+
+    graph.add("a", fail)
+    graph.add("b", lambda a: a, deps=["a"])
+    graph.join()
+    assert isinstance(graph.error("a"), ValueError)
+    assert isinstance(graph.error("b"), TaskFailed)
+    assert graph.get("b", "default") == "default"
+
+
+def test_tasks_added_while_running_are_joined():
+    graph = TaskGraph()
+
+    def plan():
+        for index in range(3):
+            graph.add(("search", index), lambda index=index: index * 10)
+        return 3
+
+    graph.add("plan", plan)
+    names = list(graph.as_completed())
+    assert len(names) == 4
+    assert set(names) == {"plan", ("search", 0), ("search", 1), ("search", 2)}
+    assert [graph.get(("search", index)) for index in range(3)] == [0, 10, 20]
+
+
+def test_timeout_fails_a_task_that_runs_too_long(release):
+    graph = TaskGraph()
+    graph.add("slow", lambda: release.wait(5), timeout=0.1)
+    graph.add("fast", lambda: "ok", timeout=0.1)
+    start = time.monotonic()
+    graph.join()
+
+    assert time.monotonic() - start < 2
+    assert "timed out" in str(graph.error("slow"))
+    assert graph.get("fast") == "ok"
+
+
+def test_task_deadline_applies_while_queued(release):
+    graph = TaskGraph()
+    graph.add("gate", lambda: release.wait(5))
+    graph.add("late", lambda gate: "never", deps=["gate"], deadline=time.monotonic() + 0.1)
+    assert next(graph.as_completed(deadline=2)) == "late"
+    assert "deadline exceeded" in str(graph.error("late"))
+
+
+def test_pipeline_deadline_fails_everything_unfinished(release):
+    graph = TaskGraph()
+    graph.add("slow", lambda: release.wait(5))
+    graph.add("fast", lambda: "ok")
+    start = time.monotonic()
+    graph.join(deadline=0.2)
+
+    assert time.monotonic() - start < 2
+    assert "pipeline deadline" in str(graph.error("slow"))
+    assert graph.get("fast") == "ok"
+
+
+def test_error_for_an_unknown_task():
+    assert isinstance(TaskGraph().error("missing"), TaskFailed)
+
+
+def test_duplicate_task_names_are_rejected():
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+    with pytest.raises(ValueError):
+        graph.add("a", lambda: 2)
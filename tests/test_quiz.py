@@ -0,0 +1,105 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from flaskr import aio, config, routes
+from flaskr.cache import TieredCache
+
+TRANSCRIPT = {"text": "Light bends when it passes from air into water. " * 20, "sha256": "abc"}
+
+
+def question(n, answer="B"):
+    return {
+        "question": f"Question {n}?",
+        "options": ["A. One", "B. Two", "C. Three", "D. Four"],
+        "answer": answer,
+    }
+
+
+class FakeLLM:
+    """
+    Hands out canned quiz answers in order, one per call; an exception is raised instead.
+    """
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.async_calls = 0
+
+    async def acreate(self, **kwargs):
+        self.async_calls += 1
+        return self._answer(kwargs)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return self._answer(kwargs)
+
+    def _answer(self, kwargs):
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        text = json.dumps({"questions": answer})
+        if kwargs.get("stream"):
+            return [
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(tool_calls=None, content=text[i:i + 16]))])
+                for i in range(0, len(text), 16)
+            ]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=None, content=text))])
+
+
+@pytest.fixture(autouse=True)
+def quiz_cache(monkeypatch):
+    monkeypatch.setattr(config, "QUIZ_QUESTION_COUNT", 8)
+    monkeypatch.setattr(config, "QUIZ_REPAIR_ATTEMPTS", 2)
+    monkeypatch.setattr(config, "CACHE_DIR", "")
+    cache = TieredCache("quiz", ttl=60)
+    monkeypatch.setattr(routes, "quiz_cache", cache)
+    return cache
+
+
+def use_llm(monkeypatch, *answers):
+    llm = FakeLLM(*answers)
+    monkeypatch.setattr(routes, "llm", llm)
+    monkeypatch.setattr(aio, "llm", llm)
+    return llm
+
+
+def test_a_failed_repair_keeps_the_valid_questions(monkeypatch):
+    use_llm(monkeypatch, [question(n) for n in range(7)] + [question(7, answer="E")], RuntimeError("rate limited"))
+    assert routes.create_quiz(TRANSCRIPT["text"]) == [question(n) for n in range(7)]
+
+
+def test_repairs_replace_only_the_invalid_questions(monkeypatch):
+    llm = use_llm(monkeypatch, [question(n) for n in range(6)], [question(6)], [question(7), question(8)])
+    assert routes.create_quiz(TRANSCRIPT["text"]) == [question(n) for n in range(8)]
+    assert llm.calls == 3
+
+
+def test_extra_questions_are_cut_to_the_question_count(monkeypatch):
+    llm = use_llm(monkeypatch, [question(n) for n in range(11)])
+    assert routes.create_quiz(TRANSCRIPT["text"]) == [question(n) for n in range(8)]
+    assert llm.calls == 1
+
+
+def test_a_streamed_quiz_survives_a_failed_repair_and_is_cached(monkeypatch, quiz_cache):
+    use_llm(monkeypatch, [question(n) for n in range(7)], RuntimeError("rate limited"))
+    assert list(routes.stream_quiz("video", TRANSCRIPT)) == [question(n) for n in range(7)]
+    assert quiz_cache.get(routes.quiz_cache_key("video", TRANSCRIPT)) == [question(n) for n in range(7)]
+
+
+def test_a_streamed_quiz_stops_at_the_question_count(monkeypatch):
+    use_llm(monkeypatch, [question(n) for n in range(10)])
+    assert list(routes.stream_quiz("video", TRANSCRIPT)) == [question(n) for n in range(8)]
+
+
+def test_async_quizzes_are_repaired_on_the_async_client(monkeypatch):
+    llm = use_llm(monkeypatch, [question(n) for n in range(6)], [question(6), question(7)])
+    assert asyncio.run(aio.create_quiz(TRANSCRIPT["text"])) == [question(n) for n in range(8)]
+    assert (llm.calls, llm.async_calls) == (0, 2)
+
+
+def test_a_failed_async_repair_keeps_the_valid_questions(monkeypatch):
+    use_llm(monkeypatch, [question(n) for n in range(7)], RuntimeError("rate limited"))
+    assert asyncio.run(aio.create_quiz(TRANSCRIPT["text"])) == [question(n) for n in range(7)]
@@ -0,0 +1,72 @@
+from flaskr.schemas import lesson_queries, normalize_query, validate_question, validate_questions
+
+
+def question(**overrides):
+    data = {
+        "question": "What is the powerhouse of the cell?",
+        "options": ["A. Nucleus", "B. Mitochondria", "C. Ribosome", "D. Golgi body"],
+        "answer": "B",
+    }
+    data.update(overrides)
+    return data
+
+
+def test_a_valid_question_is_unchanged():
+    assert validate_question(question()) == question()
+
+
+def test_option_labels_are_normalised():
+    options = ["Nucleus", "b) Mitochondria", "(C) Ribosome", "D: Golgi body"]
+    assert validate_question(question(options=options))["options"] == question()["options"]
+
+
+def test_answers_are_normalised_to_a_letter():
+    assert validate_question(question(answer="b."))["answer"] == "B"
+    assert validate_question(question(answer="Mitochondria"))["answer"] == "B"
+    assert validate_question(question(answer="B. mitochondria"))["answer"] == "B"
+
+
+def test_questions_that_cannot_be_repaired_are_dropped():
+    assert validate_question(question(answer="E")) is None
+    assert validate_question(question(options=["A. One", "B. Two", "C. Three"])) is None
+    assert validate_question(question(options=["A. One", "B. ", "C. Three", "D. Four"])) is None
+    assert validate_question(question(question="  ")) is None
+    assert validate_question({"question": "Missing the rest"}) is None
+
+
+def test_one_bad_question_does_not_sink_the_rest():
+    questions = validate_questions([question(), question(answer="Z"), question(question="Second?")])
+    assert [q["question"] for q in questions] == ["What is the powerhouse of the cell?", "Second?"]
+
+
+def test_lesson_queries_are_cleaned():
+    assert [normalize_query(query) for query in [
+        "1. Introduction to Optics",
+        "12) Lenses and Mirrors",
+        "Step 3: **Refraction**",
+        "Lesson 4 - Diffraction",
+        '- "Total internal reflection".',
+        "2001: A Space Odyssey analysis",
+        "3D printing basics",
+        "Part 2 of WWII",
+        "Lesson 3 Algebra",
+        "Part 2-3 review",
+    ]] == [
+        "Introduction to Optics",
+        "Lenses and Mirrors",
+        "Refraction",
+        "Diffraction",
+        "Total internal reflection",
+        "2001: A Space Odyssey analysis",
+        "3D printing basics",
+        "Part 2 of WWII",
+        "Lesson 3 Algebra",
+        "Part 2-3 review",
+    ]
+
+
+def test_lesson_queries_skip_invalid_steps_and_repeats_across_calls():
+    seen = set()
+    first = lesson_queries([{"step": 1, "query": "1. Optics"}, {"step": 2}, {"step": 3, "query": "optics"}], seen)
+    second = lesson_queries([{"step": 4, "query": "OPTICS"}, {"step": 5, "query": "Lenses"}], seen)
+    assert (first, second) == (["Optics"], ["Lenses"])
@@ -0,0 +1,35 @@
+from flaskr import config
+from flaskr.similarity import NearDuplicateFilter
+
+
+def admitted(queries, topic):
+    unique = NearDuplicateFilter(topic, threshold=0.75)
+    return [query for query in queries if unique.admit(query)]
+
+
+def test_rewordings_of_one_query_collapse():
+    queries = ["Neural Networks Explained", "Neural Network Tutorial", "Backpropagation", "Backpropagation Basics"]
+    assert admitted(queries, topic="Deep Learning") == ["Neural Networks Explained", "Backpropagation"]
+
+
+def test_distinct_lessons_sharing_topic_words_are_kept():
+    queries = [
+        "Convolutional Neural Networks Explained",
+        "Recurrent Neural Networks Explained",
+        "Neural Network Training",
+        "Transformers and Attention",
+    ]
+    assert admitted(queries, topic="Deep Learning") == queries
+
+
+def test_queries_made_only_of_topic_words_count_as_one():
+    # Both reduce to an empty word set once topic words and stopwords are dropped
+    queries = ["Deep Learning", "Introduction to Deep Learning", "Deep Learning Optimizers"]
+    assert admitted(queries, topic="Deep Learning") == ["Deep Learning", "Deep Learning Optimizers"]
+
+
+def test_the_threshold_comes_from_config_by_default(monkeypatch):
+    monkeypatch.setattr(config, "KEYWORD_SIMILARITY_THRESHOLD", 0.5)
+    unique = NearDuplicateFilter("Deep Learning")
+    assert unique.admit("Gradient Descent Variants")
+    assert not unique.admit("Gradient Descent")  # Overlap 2/3
@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from flaskr import config
+from flaskr.singleflight import AsyncSingleFlight, SharedFlight, SingleFlight, StreamFlight, fcntl
+
+
+def run_concurrently(count, fn):
+    """
+    Starts `count` threads calling fn() and returns what each returned or raised.
+    """
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = fn()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+class Blocking:
+    """
+    A callable that blocks until released, then returns `result` or raises `error`.
+    """
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.released.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def release_soon(self):
+        threading.Timer(0.1, self.released.set).start()
+
+
+def start_leader(fn):
+    """
+    Calls fn() on a thread that becomes the flight's leader; returns the thread and its outcome list.
+    """
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.extend(run_concurrently(1, fn)))
+    thread.start()
+    return thread, outcome
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    work = Blocking(result="result")
+    leader, outcome = start_leader(lambda: flight.do("key", work))
+    work.started.wait(5)
+
+    work.release_soon()
+    assert run_concurrently(4, lambda: flight.do("key", work)) == ["result"] * 4
+    leader.join(5)
+    assert outcome == ["result"]
+    assert work.calls == 1
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight()
+    error = ValueError("boom")
+    work = Blocking(error=error)
+    leader, outcome = start_leader(lambda: flight.do("key", work))
+    work.started.wait(5)
+
+    work.release_soon()
+    assert run_concurrently(3, lambda: flight.do("key", work)) == [error] * 3
+    leader.join(5)
+    assert outcome == [error]
+
+
+def test_a_finished_key_runs_again():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "second") == "second"
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight()
+    work = Blocking(result="slow")
+    leader, outcome = start_leader(lambda: flight.do("slow", work))
+    work.started.wait(5)
+
+    assert flight.do("fast", lambda: "fast") == "fast"
+    work.released.set()
+    leader.join(5)
+
+
+def test_join_only_waits_for_calls_in_flight():
+    flight = SingleFlight()
+    assert flight.join("key", "nothing") == "nothing"
+
+    work = Blocking(result="result")
+    leader, outcome = start_leader(lambda: flight.do("key", work))
+    work.started.wait(5)
+    work.release_soon()
+    assert flight.join("key") == "result"
+    leader.join(5)
+    assert work.calls == 1
+
+
+def test_async_calls_share_one_task():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_a_cancelled_async_waiter_does_not_cancel_the_shared_task():
+    flight = AsyncSingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+
+def test_shared_flight_publishes_the_result_to_blocked_callers(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path))
+    flight = SharedFlight("test", ttl=30, accept=lambda result: result != "error")
+    assert flight.enabled or fcntl is None
+    if not flight.enabled:
+        pytest.skip("needs fcntl")
+
+    work = Blocking(result="result")
+    leader, outcome = start_leader(lambda: flight.do("key", work))
+    work.started.wait(5)
+    work.release_soon()
+    # Separate lock handles block each other like separate worker processes do
+    assert run_concurrently(3, lambda: flight.do("key", work)) == ["result"] * 3
+    leader.join(5)
+    assert work.calls == 1
+
+
+def stream_items(count, delay=0.02, error=None):
+    calls = []
+
+    def items():
+        calls.append(1)
+        for index in range(count):
+            time.sleep(delay)
+            yield index
+        if error is not None:
+            raise error
+
+    return items, calls
+
+
+def test_stream_followers_replay_and_follow_the_leaders_items():
+    flight = StreamFlight()
+    items, calls = stream_items(5)
+    leader = flight.stream("key", items)
+    assert next(leader) == 0  # Followers arriving now must still see item 0
+
+    streams = [flight.stream("key", items) for _ in range(3)]
+    assert [next(stream) for stream in streams] == [0, 0, 0]  # Joined the flight, replaying item 0
+
+    results = []
+    followers = [threading.Thread(target=lambda stream=stream: results.append([0] + list(stream))) for stream in streams]
+    for thread in followers:
+        thread.start()
+    assert list(leader) == [1, 2, 3, 4]
+    for thread in followers:
+        thread.join(5)
+    assert results == [[0, 1, 2, 3, 4]] * 3
+    assert len(calls) == 1
+
+
+def test_a_leader_that_stops_early_finishes_the_stream_for_followers():
+    flight = StreamFlight()
+    items, calls = stream_items(4)
+    leader = flight.stream("key", items)
+    next(leader)
+    follower = flight.follow("key")
+    leader.close()  # The leader's client went away
+
+    assert list(follower) == [0, 1, 2, 3]
+    assert flight.follow("key") is None
+    assert len(calls) == 1
+
+
+def test_stream_errors_reach_every_follower():
+    flight = StreamFlight()
+    error = ValueError("boom")
+    items, calls = stream_items(2, error=error)
+    leader = flight.stream("key", items)
+    next(leader)
+    follower = flight.follow("key")
+
+    with pytest.raises(ValueError):
+        list(leader)
+    assert run_concurrently(1, lambda: list(follower)) == [error]
@@ -0,0 +1,65 @@
+from flaskr.vtt import Segment, iter_segments, parse_timestamp, transcript_text
+
+# Trimmed from a YouTube auto-caption track: every line rolls over into the next cue
+AUTO_CAPTIONS = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:07.839 --> 00:00:08.950 align:start position:0%
+ 
+what<00:00:08.400><c> is</c>
+
+00:00:08.950 --> 00:00:08.960 align:start position:0%
+what is
+ 
+
+00:00:08.960 --> 00:00:14.070 align:start position:0%
+what is
+going<00:00:09.519><c> on</c><00:00:10.240><c> here</c>
+
+00:00:14.070 --> 00:00:14.080 align:start position:0%
+ 
+ 
+
+00:00:14.080 --> 00:00:16.950 align:start position:0%
+ 
+rock<00:00:14.960><c> &amp;</c><00:00:15.200><c> roll</c>
+"""
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("02:03.450") == 123.45
+    assert parse_timestamp("01:02:03.450") == 3723.45
+
+
+def test_rolling_auto_captions_are_collapsed():
+    assert list(iter_segments(AUTO_CAPTIONS.splitlines(keepends=True))) == [
+        Segment(7.839, 8.95, "what is"),
+        Segment(8.96, 14.07, "going on here"),
+        Segment(14.08, 16.95, "rock & roll"),
+    ]
+
+
+def test_notes_styles_and_cue_identifiers_are_skipped():
+    vtt = """WEBVTT
+
+NOTE This is a comment
+that spans two lines
+
+STYLE
+::cue { color: yellow }
+
+intro
+1:00:00.000 --> 1:00:02.000
+<v Speaker>Hello</v> there
+
+00:00:02.000 --> 00:00:04.000
+General Kenobi
+"""
+    assert [segment.text for segment in iter_segments(vtt.splitlines())] == ["Hello there", "General Kenobi"]
+    assert next(iter_segments(vtt.splitlines())).start == 3600.0
+
+
+def test_transcript_text_joins_segments_and_passes_plain_text_through():
+    assert transcript_text(AUTO_CAPTIONS) == "what is going on here rock & roll"
+    assert transcript_text("not a caption file") == "not a caption file"